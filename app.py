@@ -1,33 +1,595 @@
-from flask import Flask, render_template, request, jsonify, redirect, url_for, flash
+from flask import (
+    Flask,
+    render_template,
+    stream_template,
+    request,
+    jsonify,
+    redirect,
+    url_for,
+    flash,
+    send_from_directory,
+    abort,
+    g,
+    session,
+)
+from datetime import datetime, timezone
+import hmac
+import mimetypes
 import os
-import json
-import pandas as pd
+import threading
+from werkzeug.http import is_resource_modified
 from werkzeug.utils import secure_filename
-from utils.data_loader import load_csv, get_sample_data
-from utils.analysis import (
-    calculate_summary_stats,
-    rank_by_er,
-    avg_by_hour,
-    avg_by_weekday,
-    simple_hashtag_summary,
-    generate_improvement_suggestions,
-    generate_content_recommendations,
-    calculate_engagement_metrics,
+
+# pandas・plotlyを使う分析モジュールは起動を速くするため各関数内で遅延インポートする
+from utils.snapshot import (
+    FLASH_PLACEHOLDER,
+    dataset_hash,
+    template_version,
+    settings_version,
+    load_snapshot_meta,
+    load_snapshot_results,
+    save_snapshot,
+    snapshot_paths,
 )
-from utils.chart_generator import create_hourly_chart, create_weekly_chart, create_hashtag_chart
+from utils.assets import DIST_DIR, build_assets, load_manifest, negotiate_encoding, is_immutable
 
 app = Flask(__name__)
 app.secret_key = "your-secret-key-here"
 
 # アップロード設定
 UPLOAD_FOLDER = "data"
-ALLOWED_EXTENSIONS = {"csv"}
+ALLOWED_EXTENSIONS = {"csv", "csv.gz"}
 
 app.config["UPLOAD_FOLDER"] = UPLOAD_FOLDER
+# リクエストボディ（圧縮状態）と展開後のCSVのサイズ上限
+app.config["MAX_CONTENT_LENGTH"] = 100 * 1024 * 1024
+app.config["UPLOAD_MAX_CSV_BYTES"] = 500 * 1024 * 1024
+
+# スナップショット設定（分析ページを一度だけレンダリングして保存）
+SNAPSHOT_FOLDER = "snapshots"
+SAMPLE_FILENAME = "insta_insight_sample_data_100posts.csv"
+
+app.config["SNAPSHOT_FOLDER"] = SNAPSHOT_FOLDER
+app.config["SNAPSHOT_ENABLED"] = True
+
+# 列ごとのmmapストレージ設定（UPLOAD_FOLDER/.columns/<ハッシュ>/ に保存）
+app.config["COLUMN_STORE_ENABLED"] = True
+
+# 共有メモリのデータセットストア設定（複数ワーカープロセスでパース済みの列を共有）
+app.config["SHARED_DATASETS"] = False
+app.config["SHARED_DATASET_REGISTRY"] = None
+# 参照のないまま指定秒数使われていないデータセットは共有メモリから削除する（Noneの場合は削除しない）
+app.config["SHARED_DATASET_IDLE_SECONDS"] = 60 * 60
+
+_shared_store = None
+
+# SQLiteの投稿ストア設定（時間帯別・曜日別・ハッシュタグの集計をSQLで実行）
+app.config["SQLITE_ENABLED"] = False
+app.config["SQLITE_PATH"] = None
+
+_post_stores = {}
+
+# 大きなデータセットのプレビュー設定（層化抽出した一部の投稿で先に分析を表示し、
+# 正確な分析はバックグラウンドで実行してスナップショットとして保存する）
+app.config["PREVIEW_ENABLED"] = True
+app.config["PREVIEW_MIN_BYTES"] = 20 * 1024 * 1024
+app.config["PREVIEW_SAMPLE_ROWS"] = 2000
+app.config["PREVIEW_SEED"] = 0
+
+# バックグラウンドで実行中の正確な分析（内容ハッシュ -> 状態）
+_exact_runs = {}
+_exact_runs_lock = threading.Lock()
+
+# 管理者向けプロファイリング設定（PROFILING_TOKEN を設定した場合のみ有効）
+# X-Profile-Token ヘッダー（または profile_token パラメータ）がトークンと一致するリクエストで
+# ?profile=sample|cprofile（または X-Profile ヘッダー）を指定すると、処理をプロファイルして保存する
+app.config["PROFILING_TOKEN"] = os.environ.get("PROFILING_TOKEN")
+app.config["PROFILE_FOLDER"] = "profiles"
+
+# エンゲージメント指標に追加するER定義（表示名 -> {"weights": {列: 重み}, "denominator": 分母の列}）
+# 例: {"保存重視（リーチ数）": {"weights": {"likes": 1, "comments": 2, "saves": 3}, "denominator": "reach"}}
+app.config["ER_CUSTOM_DEFINITIONS"] = {}
+
+# ビルド済みアセットのマニフェスト（未ビルドの場合は static/ の元ファイルを配信）
+ASSET_MANIFEST = load_manifest(app.static_folder)
+ASSET_MAX_AGE = 365 * 24 * 60 * 60
+
+# 前処理か派生データ（列ファイル・SQLite）の形式が変わったら、列ファイル・SQLite・共有メモリの
+# データセットとスナップショットを作り直す（versioned_key でキャッシュキーに含める）
+DATASET_VERSION = template_version(
+    [
+        os.path.join(app.root_path, "utils", name)
+        for name in ("data_loader.py", "engagement.py", "columnar.py", "column_store.py", "sqlite_store.py")
+    ]
+)
+
+# テンプレートかアセットのマニフェストが変わったらスナップショットを作り直す
+# （スナップショットにはハッシュ付きのアセットURLが埋め込まれ、再ビルドすると古いファイルは削除される）
+TEMPLATE_VERSION = settings_version(
+    template_version(
+        [os.path.join(app.root_path, "templates", name) for name in ("base.html", "_flashes.html", "analysis.html")]
+    ),
+    ASSET_MANIFEST,
+)
+
+
+def snapshot_version():
+    """スナップショットのバージョン（テンプレート・前処理・ER定義の設定が変わったら作り直す）"""
+    return settings_version(f"{TEMPLATE_VERSION}-{DATASET_VERSION}", app.config["ER_CUSTOM_DEFINITIONS"])
 
 
 def allowed_file(filename):
-    return "." in filename and filename.rsplit(".", 1)[1].lower() in ALLOWED_EXTENSIONS
+    return any(filename.lower().endswith("." + ext) for ext in ALLOWED_EXTENSIONS)
+
+
+@app.template_filter("script_json")
+def script_json(value):
+    """
+    JSON文字列を <script> 内にそのまま埋め込めるようにする
+
+    アカウントIDやハッシュタグなどアップロードされた値に </script> が含まれても
+    スクリプトを閉じられないよう、< > & をJSONのエスケープ（\\u003c など）に置き換える。
+    """
+    from markupsafe import Markup
+
+    escaped = str(value).replace("&", "\\u0026").replace("<", "\\u003c").replace(">", "\\u003e")
+    return Markup(escaped)
+
+
+@app.context_processor
+def inject_asset_url():
+    """テンプレートから asset_url() でアセットのURLを参照できるようにする"""
+
+    def asset_url(filename):
+        if filename in ASSET_MANIFEST:
+            return url_for("assets", filename=ASSET_MANIFEST[filename])
+        return url_for("static", filename=filename)
+
+    return dict(asset_url=asset_url)
+
+
+def get_catalog():
+    """アップロードされたデータセットのカタログ（ファイル名 -> 内容ハッシュ）"""
+    from utils.dataset_store import DatasetCatalog
+
+    return DatasetCatalog(app.config["UPLOAD_FOLDER"])
+
+
+def dataset_path(filename):
+    """ファイル名からデータセットのパスを取得"""
+    if filename == SAMPLE_FILENAME:
+        return os.path.join(os.path.dirname(__file__), "data", SAMPLE_FILENAME)
+    catalog = get_catalog()
+    key = catalog.resolve(filename)
+    if key is not None:
+        return catalog.object_path(key)
+    # カタログ導入前に UPLOAD_FOLDER へ直接保存されたファイル
+    return os.path.join(app.config["UPLOAD_FOLDER"], filename)
+
+
+def dataset_key(filename):
+    """
+    データセットの内容ハッシュを取得
+
+    列ファイル・共有メモリ・スナップショットなど派生データのキャッシュキーとして使う。
+    カタログに登録済みのデータセットはハッシュを再計算しない。
+    """
+    if filename != SAMPLE_FILENAME:
+        key = get_catalog().resolve(filename)
+        if key is not None:
+            return key
+    return dataset_hash(dataset_path(filename))
+
+
+def versioned_key(key):
+    """
+    列ファイル・SQLite・共有メモリのキャッシュキー
+
+    内容ハッシュに前処理・形式のバージョン（DATASET_VERSION）を加え、
+    前処理を変更する前に作成したデータを読み込まないようにする。
+    """
+    return f"{key}-{DATASET_VERSION}"
+
+
+def snapshot_key(filename):
+    """
+    データセットのスナップショットのキー
+
+    ページにはファイル名（表示名・URL）が埋め込まれるため、内容ハッシュにファイル名を加え、
+    同じ内容を別名でアップロードしたデータセットとスナップショットを共有しない。
+    """
+    return settings_version(dataset_key(filename), filename)
+
+
+def parse_dataset(filename):
+    """ファイル名からCSVを読み込んで前処理する"""
+    from utils.data_loader import load_csv, get_sample_data
+
+    if filename == SAMPLE_FILENAME:
+        return get_sample_data()
+    return load_csv(dataset_path(filename))
+
+
+def read_dataset(filename):
+    """
+    データセットを読み込む
+
+    列ごとのmmapストレージが有効な場合は保存済みの列をmmapし、
+    未保存であればCSVをパースして列ファイルを作成する。
+    """
+    if not app.config["COLUMN_STORE_ENABLED"]:
+        return parse_dataset(filename)
+
+    from utils.column_store import load_columns, save_columns
+
+    key = versioned_key(dataset_key(filename))
+    df = load_columns(app.config["UPLOAD_FOLDER"], key)
+    if df is None:
+        df = parse_dataset(filename)
+        save_columns(app.config["UPLOAD_FOLDER"], key, df)
+    return df
+
+
+def get_shared_store():
+    """プロセス内で共有メモリストアを1つだけ作成して返す"""
+    global _shared_store
+    if _shared_store is None:
+        from utils.shared_store import SharedDatasetStore
+
+        _shared_store = SharedDatasetStore(
+            app.config["SHARED_DATASET_REGISTRY"], idle_seconds=app.config["SHARED_DATASET_IDLE_SECONDS"]
+        )
+    return _shared_store
+
+
+def load_dataset(filename):
+    """
+    ファイル名からデータセットを読み込み
+
+    共有メモリストアが有効な場合は、他のワーカーが公開済みのデータセットに
+    接続し、未公開であれば読み込んで公開する。接続はリクエスト終了時に解放する。
+    """
+    if not app.config["SHARED_DATASETS"]:
+        df = read_dataset(filename)
+        record_profiled_rows(df)
+        return df
+
+    # ファイル名をキー、内容ハッシュ（と前処理のバージョン）をバージョンにし、変わると古い世代を退役させる
+    store = get_shared_store()
+    version = versioned_key(dataset_key(filename))
+    dataset = store.attach(filename, version)
+    if dataset is None:
+        df = read_dataset(filename)
+        store.publish(filename, version, df)
+        dataset = store.attach(filename, version)
+        if dataset is None:
+            # 公開直後に別のワーカーが新しい内容で置き換えた場合
+            record_profiled_rows(df)
+            return df
+
+    g.setdefault("shared_datasets", []).append(dataset)
+    record_profiled_rows(dataset.df)
+    return dataset.df
+
+
+def get_post_store():
+    """SQLiteの投稿ストアを返す（保存先は SQLITE_PATH、未指定の場合は UPLOAD_FOLDER 内）"""
+    from utils.sqlite_store import SQLITE_NAME, PostStore
+
+    path = app.config["SQLITE_PATH"] or os.path.join(app.config["UPLOAD_FOLDER"], SQLITE_NAME)
+    if path not in _post_stores:
+        _post_stores[path] = PostStore(path)
+    return _post_stores[path]
+
+
+def sql_aggregates(filename):
+    """
+    データセットのSQL集計を返す（SQLiteストアが無効な場合はNone）
+
+    ストアに未保存のデータセットは読み込んで保存する。
+    """
+    if not app.config["SQLITE_ENABLED"]:
+        return None
+
+    store = get_post_store()
+    key = versioned_key(dataset_key(filename))
+    if not store.has_dataset(key):
+        store.save(key, load_dataset(filename))
+    return store.aggregates(key)
+
+
+def profiling_authorized():
+    """リクエストが管理者用のプロファイリングトークンを持っているか"""
+    token = app.config["PROFILING_TOKEN"]
+    if not token:
+        return False
+    supplied = request.headers.get("X-Profile-Token") or request.args.get("profile_token") or ""
+    return hmac.compare_digest(supplied.encode("utf-8"), token.encode("utf-8"))
+
+
+@app.before_request
+def start_profiling():
+    """?profile= または X-Profile ヘッダーを指定した管理者のリクエストをプロファイルする"""
+    from utils.profiling import PROFILE_MODES
+
+    value = request.headers.get("X-Profile") or request.args.get("profile")
+    if not value or not profiling_authorized():
+        return
+    mode = "sample" if value in ("1", "true") else value
+    if mode not in PROFILE_MODES:
+        return
+
+    from utils.profiling import RequestProfiler
+
+    tags = {"route": request.url_rule.rule if request.url_rule else None, "endpoint": request.endpoint}
+    tags.update(method=request.method, path=request.path)
+    filename = (request.view_args or {}).get("filename") or request.args.get("filename")
+    if filename and os.path.exists(dataset_path(filename)):
+        tags.update(dataset=filename, dataset_hash=dataset_key(filename))
+
+    g.profiler = RequestProfiler(mode, tags)
+    g.profiler.start()
+
+
+def record_profiled_rows(df, sample=False):
+    """プロファイル中のリクエストで分析したデータセットの行数を記録"""
+    profiler = g.get("profiler")
+    if profiler is not None:
+        profiler.tags.update(rows=len(df), sampled=sample)
+
+
+@app.after_request
+def finish_profiling(response):
+    """
+    レスポンスの送信完了後にプロファイルを終了して保存する
+
+    ストリーミングのレスポンスも最後まで計測するため、call_on_close で終了する。
+    終了を登録したプロファイラは g から取り除き、stop_unfinished_profiling の対象外にする。
+    """
+    profiler = g.pop("profiler", None)
+    if profiler is None:
+        return response
+
+    folder = os.path.abspath(app.config["PROFILE_FOLDER"])
+
+    def finish():
+        profiler.stop()
+        profiler.tags["status"] = response.status_code
+        profiler.save(folder)
+
+    response.call_on_close(finish)
+    response.headers["X-Profile-Id"] = profiler.id
+    return response
+
+
+@app.teardown_request
+def stop_unfinished_profiling(exc):
+    """
+    例外で after_request が実行されなかったリクエストのプロファイルを終了して保存する
+
+    プロファイラのスレッドが残ったり cProfile が有効なままにならないようにする。
+    """
+    profiler = g.pop("profiler", None)
+    if profiler is None:
+        return
+
+    profiler.stop()
+    profiler.tags["status"] = 500
+    if exc is not None:
+        profiler.tags["error"] = f"{type(exc).__name__}: {exc}"
+    profiler.save(os.path.abspath(app.config["PROFILE_FOLDER"]))
+
+
+@app.teardown_request
+def release_shared_datasets(exc):
+    """リクエスト中に接続した共有データセットを解放"""
+    for dataset in g.pop("shared_datasets", []):
+        get_shared_store().release(dataset)
+
+
+def build_analysis_context(df, filename, streaming=False):
+    """
+    分析ページのテンプレート変数を作成
+
+    各セクションはテンプレートが section() で参照した時点で計算する。
+    streaming=True の場合、計算でエラーになったセクションは例外を送出せず
+    ページ内にエラーとして表示する（送信を始めた後はリダイレクトできないため）。
+
+    Returns:
+        tuple: (LazyAnalysis, テンプレート変数の辞書)
+    """
+    from utils.sections import LazyAnalysis
+
+    analysis = LazyAnalysis(
+        df, aggregates=sql_aggregates(filename), er_definitions=app.config["ER_CUSTOM_DEFINITIONS"]
+    )
+    section = analysis.section if streaming else analysis.get
+    return analysis, {"section": section, "section_error": analysis.errors.get, "filename": filename}
+
+
+def render_analysis_snapshot(filename):
+    """
+    分析ページをレンダリングしてスナップショットとして保存する
+
+    Returns:
+        str or None: レンダリング済みHTML（データが空の場合はNone）
+    """
+    key = snapshot_key(filename)
+    df = load_dataset(filename)
+    if df.empty:
+        return None
+
+    analysis, context = build_analysis_context(df, filename)
+    # フラッシュメッセージは配信時に差し込むため、スナップショットには含めない
+    html = render_template("analysis.html", snapshot=True, flash_placeholder=FLASH_PLACEHOLDER, **context)
+    save_snapshot(app.config["SNAPSHOT_FOLDER"], key, html, analysis.template_context(), snapshot_version(), filename)
+    return html
+
+
+def stream_analysis(filename, key=None):
+    """
+    分析ページを計算しながらストリーミングで返す
+
+    ヘッダーとサマリー統計は最初のセクションが計算できた時点で送信し、
+    以降のセクションは計算が終わったものから順に送信する。
+    以降のセクションでエラーが発生した場合は、そのセクションにエラーを表示して送信を続ける。
+    key を指定した場合は送信完了後にスナップショットとして保存する（エラーがあった場合を除く）。
+
+    Returns:
+        Response or None: ストリーミングのレスポンス（データが空の場合はNone）
+    """
+    df = load_dataset(filename)
+    if df.empty:
+        return None
+
+    analysis, context = build_analysis_context(df, filename, streaming=True)
+    # 送信開始後はリダイレクトできないため、最初のセクションは先に計算してエラーを検出する
+    analysis.get("stats")
+    flashes = render_template("_flashes.html")
+    chunks = stream_template("analysis.html", snapshot=True, flash_placeholder=FLASH_PLACEHOLDER, **context)
+
+    def generate():
+        parts = []
+        for chunk in chunks:
+            parts.append(chunk)
+            yield chunk.replace(FLASH_PLACEHOLDER, flashes) if FLASH_PLACEHOLDER in chunk else chunk
+        # エラーになったセクションを含むページはスナップショットに保存しない
+        if key is not None and not analysis.errors:
+            results = analysis.template_context()
+            save_snapshot(app.config["SNAPSHOT_FOLDER"], key, "".join(parts), results, snapshot_version(), filename)
+
+    response = app.response_class(generate(), mimetype="text/html")
+    if flashes.strip():
+        response.cache_control.no_store = True
+    else:
+        response.cache_control.no_cache = True
+    return response
+
+
+def wants_preview(filename, mode):
+    """
+    分析ページをプレビュー（層化抽出した標本での分析）で返すか
+
+    ?mode=preview / ?mode=exact で明示でき、未指定の場合は PREVIEW_MIN_BYTES 以上の
+    データセットをプレビューにする。
+    """
+    if mode == "preview":
+        return True
+    if mode == "exact" or not app.config["PREVIEW_ENABLED"]:
+        return False
+    return os.path.getsize(dataset_path(filename)) >= app.config["PREVIEW_MIN_BYTES"]
+
+
+def exact_run_status(key):
+    """
+    バックグラウンドの正確な分析の状態
+
+    Returns:
+        dict: status が idle・running・ready・error のいずれか（error の場合は error にメッセージ）
+    """
+    if load_snapshot_meta(app.config["SNAPSHOT_FOLDER"], key, snapshot_version()) is not None:
+        return {"status": "ready"}
+    with _exact_runs_lock:
+        return dict(_exact_runs.get(key, {"status": "idle"}))
+
+
+def start_exact_run(filename, key):
+    """
+    正確な分析をバックグラウンドのスレッドで実行し、スナップショットとして保存する
+
+    同じデータセットの分析が実行中の場合は何もしない（状態はプロセスごとに管理し、
+    完了の判定は保存されたスナップショットで行うため他のワーカーからも分かる）。
+    """
+    with _exact_runs_lock:
+        if _exact_runs.get(key, {}).get("status") == "running":
+            return
+        _exact_runs[key] = {"status": "running"}
+
+    def run():
+        try:
+            with app.test_request_context(f"/analysis/{filename}"):
+                html = render_analysis_snapshot(filename)
+            state = {"status": "ready"} if html is not None else {"status": "error", "error": "データが空です"}
+        except Exception as e:
+            state = {"status": "error", "error": str(e)}
+        with _exact_runs_lock:
+            _exact_runs[key] = state
+
+    threading.Thread(target=run, name=f"exact-analysis-{key[:8]}", daemon=True).start()
+
+
+def stream_preview(filename, key=None):
+    """
+    層化抽出した標本で分析ページを計算しながらストリーミングで返す
+
+    ファイル全体は読まず、load_csv でランダムな位置から読み込んだ行を層化抽出して
+    分析する。プレビューはスナップショットに保存しない。
+    key を指定した場合は、正確な分析をバックグラウンドで開始できるようにする。
+    引用符で囲まれた改行を含み行単位で抽出できないデータセットは、正確な分析を返す。
+
+    Returns:
+        Response or None: ストリーミングのレスポンス（データが空の場合はNone）
+    """
+    from utils.data_loader import load_csv
+    from utils.sampling import QuotedNewlineError
+    from utils.sections import LazyAnalysis
+
+    try:
+        df = load_csv(
+            dataset_path(filename), sample_size=app.config["PREVIEW_SAMPLE_ROWS"], seed=app.config["PREVIEW_SEED"]
+        )
+    except QuotedNewlineError:
+        return stream_analysis(filename, key)
+    if df.empty:
+        return None
+
+    # attrs に残すとpandasが行ごとのSeriesを作るたびに複製するため取り出しておく
+    sample = df.attrs.pop("sample")
+    record_profiled_rows(df, sample=True)
+    analysis = LazyAnalysis(df, er_definitions=app.config["ER_CUSTOM_DEFINITIONS"], sample=sample)
+    analysis.get("stats")
+    chunks = stream_template(
+        "analysis.html",
+        section=analysis.section,
+        section_error=analysis.errors.get,
+        filename=filename,
+        preview=sample,
+        exact_status=exact_run_status(key) if key is not None else None,
+    )
+
+    response = app.response_class(chunks, mimetype="text/html")
+    response.cache_control.no_store = True
+    return response
+
+
+def snapshot_response(key, meta):
+    """
+    スナップショットを条件付きGET（ETag・Last-Modified）に対応したレスポンスとして返す
+
+    ブラウザやプロキシの再検証で内容が変わっていなければ、HTMLを読み込まずに
+    304を返す。表示待ちのフラッシュメッセージがある場合は差し込んで返し、
+    その応答はキャッシュさせない。
+    """
+    html_path = snapshot_paths(app.config["SNAPSHOT_FOLDER"], key)[0]
+    last_modified = datetime.fromtimestamp(int(os.path.getmtime(html_path)), tz=timezone.utc)
+    has_flashes = bool(session.get("_flashes"))
+
+    if not has_flashes and not is_resource_modified(request.environ, etag=meta["etag"], last_modified=last_modified):
+        response = app.response_class(status=304)
+    else:
+        with open(html_path, "r", encoding="utf-8") as f:
+            html = f.read()
+        if has_flashes:
+            html = html.replace(FLASH_PLACEHOLDER, render_template("_flashes.html"), 1)
+        response = app.response_class(html, mimetype="text/html")
+
+    if has_flashes:
+        response.cache_control.no_store = True
+    else:
+        response.set_etag(meta["etag"])
+        response.last_modified = last_modified
+        response.cache_control.no_cache = True
+    return response
 
 
 @app.route("/")
@@ -36,40 +598,94 @@ def index():
     return render_template("index.html")
 
 
+@app.route("/assets/<path:filename>")
+def assets(filename):
+    """ビルド済みアセットを事前圧縮版と長期キャッシュヘッダー付きで配信"""
+    dist_folder = os.path.join(app.static_folder, DIST_DIR)
+    served, encoding = negotiate_encoding(dist_folder, filename, request.accept_encodings)
+    immutable = is_immutable(filename, ASSET_MANIFEST)
+
+    response = send_from_directory(
+        dist_folder,
+        served,
+        mimetype=mimetypes.guess_type(filename)[0] or "application/octet-stream",
+        max_age=ASSET_MAX_AGE if immutable else 0,
+    )
+    if encoding:
+        response.headers["Content-Encoding"] = encoding
+    response.vary.add("Accept-Encoding")
+    response.cache_control.public = True
+    response.cache_control.immutable = immutable
+    return response
+
+
 @app.route("/upload", methods=["POST"])
 def upload_file():
-    """ファイルアップロード処理"""
-    if "file" not in request.files:
+    """ファイルアップロード処理（受信しながら検証・展開・パースする）"""
+    boundary = request.mimetype_params.get("boundary")
+    if request.mimetype != "multipart/form-data" or not boundary:
         flash("ファイルが選択されていません")
         return redirect(url_for("index"))
 
-    file = request.files["file"]
-    if file.filename == "":
-        flash("ファイルが選択されていません")
+    from werkzeug.exceptions import RequestEntityTooLarge
+    from utils.upload_stream import UploadError, receive_upload
+
+    try:
+        original_filename, tmp_path, key, parser = receive_upload(
+            request.stream,
+            boundary,
+            app.config["UPLOAD_FOLDER"],
+            allowed_file,
+            max_csv_bytes=app.config["UPLOAD_MAX_CSV_BYTES"],
+        )
+    except UploadError as e:
+        flash(str(e))
+        return redirect(url_for("index"))
+    except RequestEntityTooLarge:
+        flash(f"ファイルサイズが上限（{app.config['MAX_CONTENT_LENGTH'] // (1024 * 1024)}MB）を超えています")
+        return redirect(url_for("index"))
+    except Exception as e:
+        flash(f"ファイルの読み込みエラー: {str(e)}")
         return redirect(url_for("index"))
 
-    if file and allowed_file(file.filename):
-        filename = secure_filename(file.filename)
-        filepath = os.path.join(app.config["UPLOAD_FOLDER"], filename)
-        file.save(filepath)
+    # 展開後のCSVを内容ハッシュで保存（.csv.gz は .csv に変換）
+    filename = secure_filename(original_filename)
+    if filename.lower().endswith(".gz"):
+        filename = filename[:-3]
+    catalog = get_catalog()
+    filename, existing = catalog.add(filename, key, tmp_path)
 
-        try:
-            df = load_csv(filepath)
-            return redirect(url_for("analysis", filename=filename))
-        except Exception as e:
-            flash(f"ファイルの読み込みエラー: {str(e)}")
-            return redirect(url_for("index"))
-    else:
-        flash("CSVファイルを選択してください")
+    if existing is not None:
+        # 同じ内容は保存済みのため、前処理をせずに列ファイル・スナップショットをそのまま再利用する
+        flash(f"同じ内容のファイルが「{existing}」として登録済みのため、保存済みの分析結果を使用します")
+        return redirect(url_for("analysis", filename=existing))
+
+    try:
+        df = parser.result()
+    except Exception as e:
+        catalog.remove(filename)
+        flash(f"ファイルの読み込みエラー: {str(e)}")
         return redirect(url_for("index"))
 
+    if app.config["COLUMN_STORE_ENABLED"]:
+        from utils.column_store import save_columns
+
+        save_columns(app.config["UPLOAD_FOLDER"], versioned_key(key), df)
+
+    if app.config["SQLITE_ENABLED"]:
+        get_post_store().save(versioned_key(key), df)
+
+    return redirect(url_for("analysis", filename=filename))
+
 
 @app.route("/sample")
 def load_sample():
     """サンプルデータを読み込み"""
     try:
+        from utils.data_loader import get_sample_data
+
         df = get_sample_data()
-        return redirect(url_for("analysis", filename="insta_insight_sample_data_100posts.csv"))
+        return redirect(url_for("analysis", filename=SAMPLE_FILENAME))
     except Exception as e:
         flash(f"サンプルデータの読み込みエラー: {str(e)}")
         return redirect(url_for("index"))
@@ -78,60 +694,107 @@ def load_sample():
 @app.route("/analysis/<filename>")
 def analysis(filename):
     """分析ページ"""
+    mode = request.args.get("mode")
     try:
-        if filename == "insta_insight_sample_data_100posts.csv":
-            df = get_sample_data()
+        if app.config["SNAPSHOT_ENABLED"]:
+            # 変更のないデータセットはpandasを使わずスナップショット（または304）を返す
+            key = snapshot_key(filename)
+            meta = load_snapshot_meta(app.config["SNAPSHOT_FOLDER"], key, snapshot_version())
+            # プロファイル中は分析の処理を計測できるよう、スナップショットを使わず計算し直す
+            if meta is not None and mode != "preview" and "profiler" not in g:
+                return snapshot_response(key, meta)
+
+            if wants_preview(filename, mode):
+                # 大きなデータセットは標本で先に表示し、正確な分析はバックグラウンドで実行できるようにする
+                response = stream_preview(filename, key)
+            else:
+                # 初回は計算しながら送信し、送信完了後にスナップショットとして保存する
+                response = stream_analysis(filename, key)
+        elif wants_preview(filename, mode):
+            response = stream_preview(filename)
         else:
-            filepath = os.path.join(app.config["UPLOAD_FOLDER"], filename)
-            df = load_csv(filepath)
+            response = stream_analysis(filename)
 
-        if df.empty:
+        if response is None:
             flash("データが空です")
             return redirect(url_for("index"))
+        return response
+
+    except Exception as e:
+        flash(f"分析エラー: {str(e)}")
+        return redirect(url_for("index"))
 
-        # 統計情報を計算
-        stats = calculate_summary_stats(df)
 
-        # ランキングデータ
-        top_rankings = rank_by_er(df, top=True, n=10)
-        bottom_rankings = rank_by_er(df, top=False, n=10)
+@app.route("/analysis/<filename>/exact", methods=["POST"])
+def start_exact_analysis(filename):
+    """プレビュー表示中のデータセットの正確な分析をバックグラウンドで開始"""
+    if not app.config["SNAPSHOT_ENABLED"]:
+        return jsonify({"error": "スナップショットが無効のため、バックグラウンドで分析できません"}), 400
+    if not os.path.exists(dataset_path(filename)):
+        return jsonify({"error": "ファイルが見つかりません"}), 404
 
-        # 時間帯別分析
-        hourly_data = avg_by_hour(df)
-        hourly_chart = create_hourly_chart(df) if not hourly_data.empty else None
+    key = snapshot_key(filename)
+    if exact_run_status(key)["status"] != "ready":
+        start_exact_run(filename, key)
+    return jsonify(exact_run_status(key)), 202
 
-        # 曜日別分析
-        weekly_data = avg_by_weekday(df)
-        weekly_chart = create_weekly_chart(df) if not weekly_data.empty else None
 
-        # ハッシュタグ分析
-        hashtag_data = simple_hashtag_summary(df, top_n=10)
-        hashtag_chart = create_hashtag_chart(df, top_n=10) if not hashtag_data.empty else None
+@app.route("/api/analysis/<filename>/status")
+def exact_analysis_status(filename):
+    """バックグラウンドの正確な分析の状態を取得"""
+    if not os.path.exists(dataset_path(filename)):
+        return jsonify({"error": "ファイルが見つかりません"}), 404
+    return jsonify(exact_run_status(snapshot_key(filename)))
 
-        # 改善提案を生成
-        improvement_suggestions = generate_improvement_suggestions(df)
 
-        # 内容分析による改善提案を生成
-        content_recommendations = generate_content_recommendations(df)
+@app.route("/admin/profiles")
+def list_saved_profiles():
+    """保存済みプロファイルの一覧（管理者用）"""
+    from utils.profiling import list_profiles
 
-        # エンゲージメント指標を計算
-        engagement_metrics = calculate_engagement_metrics(df)
+    if not app.config["PROFILING_TOKEN"]:
+        abort(404)
+    if not profiling_authorized():
+        abort(403)
+    return jsonify({"profiles": list_profiles(os.path.abspath(app.config["PROFILE_FOLDER"]))})
 
+
+@app.route("/admin/profiles/<name>")
+def download_profile(name):
+    """保存済みプロファイルのファイル（.pstats・.collapsed・.json）をダウンロード（管理者用）"""
+    if not app.config["PROFILING_TOKEN"]:
+        abort(404)
+    if not profiling_authorized():
+        abort(403)
+    return send_from_directory(os.path.abspath(app.config["PROFILE_FOLDER"]), name, as_attachment=True)
+
+
+@app.route("/accounts/<filename>")
+def accounts(filename):
+    """アカウント比較ページ（全アカウントをまとめて集計）"""
+    try:
+        from utils.accounts import ACCOUNT_COLUMN
+        from utils.sections import LazyAnalysis
+        from utils.chart_generator import create_account_comparison_chart
+
+        df = load_dataset(filename)
+        analysis = LazyAnalysis(df)
+        partitioned = analysis.get("accounts")
+        if "error" in partitioned:
+            flash(partitioned["error"])
+            return redirect(url_for("analysis", filename=filename))
+
+        comparison = analysis.get("account_comparison")
+        top_posts = {
+            account: group.head(3).to_dict("records")
+            for account, group in partitioned["top_rankings"].groupby(ACCOUNT_COLUMN, sort=False)
+        }
         return render_template(
-            "analysis.html",
-            stats=stats,
-            top_rankings=top_rankings,
-            bottom_rankings=bottom_rankings,
-            hourly_data=hourly_data,
-            weekly_data=weekly_data,
-            hashtag_data=hashtag_data,
-            hourly_chart=hourly_chart,
-            weekly_chart=weekly_chart,
-            hashtag_chart=hashtag_chart,
-            improvement_suggestions=improvement_suggestions,
-            content_recommendations=content_recommendations,
-            engagement_metrics=engagement_metrics,
+            "accounts.html",
             filename=filename,
+            comparison=comparison,
+            comparison_chart=create_account_comparison_chart(comparison),
+            top_posts=top_posts,
         )
 
     except Exception as e:
@@ -139,17 +802,63 @@ def analysis(filename):
         return redirect(url_for("index"))
 
 
+@app.route("/api/analysis/<filename>")
+def get_analysis(filename):
+    """
+    分析結果をJSONで取得
+
+    ?sections=stats,hourly,hashtags のように指定したセクション（と依存セクション）
+    だけを計算する。未指定の場合は全セクションを返す。
+    """
+    # スナップショットから返す場合にpandasを読み込まないよう、セクション名はpandasを使わないモジュールから取得する
+    from utils.section_names import TEMPLATE_SECTIONS, parse_sections
+
+    try:
+        names = parse_sections(request.args.get("sections"))
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
+
+    path = dataset_path(filename)
+    if not os.path.exists(path):
+        return jsonify({"error": "ファイルが見つかりません"}), 404
+
+    try:
+        # スナップショットに全セクションが含まれていればpandasを使わずに返す（プロファイル中は計算し直す）
+        snapshot = None
+        if app.config["SNAPSHOT_ENABLED"] and "profiler" not in g:
+            snapshot = load_snapshot_results(app.config["SNAPSHOT_FOLDER"], snapshot_key(filename))
+        if snapshot is not None and snapshot["meta"].get("template_version") == snapshot_version():
+            results = {
+                TEMPLATE_SECTIONS[key]: value
+                for key, value in snapshot["results"].items()
+                if key in TEMPLATE_SECTIONS
+            }
+            if all(name in results for name in names):
+                return jsonify({"filename": filename, "sections": {name: results[name] for name in names}})
+
+        from utils.sections import LazyAnalysis
+        from utils.snapshot import to_jsonable
+
+        sections = LazyAnalysis(
+            lambda: load_dataset(filename),
+            aggregates=sql_aggregates(filename),
+            er_definitions=app.config["ER_CUSTOM_DEFINITIONS"],
+        ).select(names)
+        return jsonify({"filename": filename, "sections": to_jsonable(sections)})
+
+    except Exception as e:
+        return jsonify({"error": str(e)}), 500
+
+
 @app.route("/api/chart/<chart_type>")
 def get_chart(chart_type):
     """チャートデータをAPIで取得"""
-    filename = request.args.get("filename", "insta_insight_sample_data_100posts.csv")
+    filename = request.args.get("filename", SAMPLE_FILENAME)
 
     try:
-        if filename == "insta_insight_sample_data_100posts.csv":
-            df = get_sample_data()
-        else:
-            filepath = os.path.join(app.config["UPLOAD_FOLDER"], filename)
-            df = load_csv(filepath)
+        from utils.chart_generator import create_hourly_chart, create_weekly_chart, create_hashtag_chart
+
+        df = load_dataset(filename)
 
         if chart_type == "hourly":
             chart_data = create_hourly_chart(df)
@@ -166,6 +875,33 @@ def get_chart(chart_type):
         return jsonify({"error": str(e)}), 500
 
 
+@app.cli.command("precompute-snapshots")
+def precompute_snapshots():
+    """データディレクトリ内の全CSVについて分析スナップショットを事前生成"""
+    folder = app.config["UPLOAD_FOLDER"]
+    filenames = set(get_catalog().names())
+    filenames.update(name for name in os.listdir(folder) if allowed_file(name) and not name.startswith("."))
+    for filename in sorted(filenames):
+        key = snapshot_key(filename)
+        if load_snapshot_meta(app.config["SNAPSHOT_FOLDER"], key, snapshot_version()) is not None:
+            print(f"スキップ（最新）: {filename}")
+            continue
+
+        try:
+            with app.test_request_context(f"/analysis/{filename}"):
+                html = render_analysis_snapshot(filename)
+            print(f"{'生成' if html is not None else 'スキップ（空データ）'}: {filename}")
+        except Exception as e:
+            print(f"エラー: {filename}: {str(e)}")
+
+
+@app.cli.command("build-assets")
+def build_assets_command():
+    """静的アセットをハッシュ付きファイル名・事前圧縮版で static/dist/ に出力"""
+    manifest = build_assets(app.static_folder)
+    print(f"{len(manifest)}個のアセットをビルドしました: {os.path.join(app.static_folder, DIST_DIR)}")
+
+
 if __name__ == "__main__":
     # データディレクトリを作成
     os.makedirs(UPLOAD_FOLDER, exist_ok=True)
@@ -0,0 +1,103 @@
+"""
+ワーカー起動時間のベンチマーク
+
+新しいPythonプロセスで app をインポートし、以下を計測する：
+
+- import_s: app モジュールのインポート時間
+- first_index_s: プロセス開始から `/` の最初のレスポンスまでの時間
+- first_analysis_s: 続けて `/analysis/<sample>` を（スナップショット・列ファイルなしで）処理するまでの時間
+- heavy_modules: `/` を返した時点で読み込まれていた重いモジュール
+
+使い方:
+    python benchmarks/bench_startup.py [--runs 5] [--output bench_output.txt]
+"""
+
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+from datetime import datetime
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# 子プロセスで実行する計測コード
+PROBE = r"""
+import json, sys, tempfile, time
+start = time.perf_counter()
+import app
+imported = time.perf_counter()
+
+# 毎回CSVのパースから計測するよう、キャッシュを無効にして保存先も一時ディレクトリにする
+# （リポジトリの data/ に列ファイルなどを作らない）
+workdir = tempfile.mkdtemp(prefix="bench-startup-")
+app.app.config.update(
+    SNAPSHOT_ENABLED=False,
+    COLUMN_STORE_ENABLED=False,
+    UPLOAD_FOLDER=workdir,
+    SNAPSHOT_FOLDER=workdir,
+)
+client = app.app.test_client()
+assert client.get("/").status_code == 200
+first_index = time.perf_counter()
+heavy = [m for m in ("numpy", "pandas", "plotly") if m in sys.modules]
+
+# 分析ページはストリーミングで返すため、本文を最後まで読んで全セクションの計算を含める
+response = client.get("/analysis/" + app.SAMPLE_FILENAME)
+assert response.status_code == 200 and response.get_data().rstrip().endswith(b"</html>")
+first_analysis = time.perf_counter()
+
+import shutil
+shutil.rmtree(workdir, ignore_errors=True)
+
+print(json.dumps({
+    "import_s": imported - start,
+    "first_index_s": first_index - start,
+    "first_analysis_s": first_analysis - start,
+    "heavy_modules": heavy,
+}))
+"""
+
+
+def run_probe():
+    """新しいプロセスで1回計測する"""
+    result = subprocess.run(
+        [sys.executable, "-c", PROBE],
+        cwd=ROOT,
+        capture_output=True,
+        text=True,
+        check=True,
+    )
+    return json.loads(result.stdout.strip().splitlines()[-1])
+
+
+def main():
+    parser = argparse.ArgumentParser(description="ワーカー起動時間のベンチマーク")
+    parser.add_argument("--runs", type=int, default=5, help="計測回数（中央値を報告）")
+    parser.add_argument("--output", help="結果をJSON Lines形式で追記するファイル")
+    args = parser.parse_args()
+
+    samples = [run_probe() for _ in range(args.runs)]
+
+    report = {
+        "timestamp": datetime.now().isoformat(timespec="seconds"),
+        "python": sys.version.split()[0],
+        "runs": args.runs,
+        "heavy_modules": samples[-1]["heavy_modules"],
+    }
+    for key in ("import_s", "first_index_s", "first_analysis_s"):
+        report[key] = round(statistics.median(sample[key] for sample in samples), 4)
+
+    print(f"インポート時間:           {report['import_s'] * 1000:8.1f} ms")
+    print(f"最初の / レスポンス:      {report['first_index_s'] * 1000:8.1f} ms")
+    print(f"最初の /analysis 完了:    {report['first_analysis_s'] * 1000:8.1f} ms")
+    print(f"/ 応答時点の重いモジュール: {', '.join(report['heavy_modules']) or 'なし'}")
+
+    if args.output:
+        with open(args.output, "a", encoding="utf-8") as f:
+            f.write(json.dumps(report, ensure_ascii=False) + "\n")
+
+
+if __name__ == "__main__":
+    main()
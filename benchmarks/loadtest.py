@@ -0,0 +1,446 @@
+"""
+HTTPルートの負荷テスト
+
+アプリをローカルで起動し（または --url で指定した起動済みのサーバーに対して）、
+asyncio で複数の接続から同時にリクエストを送り、シナリオごとのレイテンシ
+（p50/p95/p99）とスループット（requests/sec）を報告する。
+
+データセットは指定した行数の合成CSVを作成して /upload でアップロードし、
+その分析ページ・チャートAPIに対してリクエストの割合（--mix）に従って負荷をかける。
+
+シナリオ:
+- index: `/`
+- analysis: `/analysis/<filename>`（スナップショット有効時は初回以外キャッシュ配信）
+- revalidate: `/analysis/<filename>` を If-None-Match 付きで再検証（304）
+- chart: `/api/chart/<hourly|weekly|hashtag>?filename=<filename>`
+- upload: `/upload`（同じ内容のため重複排除された登録になる）
+
+使い方:
+    python benchmarks/loadtest.py [--sizes 1000,10000] [--concurrency 8] [--duration 10]
+        [--mix index=1,analysis=4,chart=3,upload=1] [--no-snapshots] [--url http://host:port]
+        [--output loadtest_output.txt]
+"""
+
+import argparse
+import asyncio
+import csv
+import io
+import json
+import os
+import random
+import socket
+import subprocess
+import sys
+import tempfile
+import time
+import uuid
+from datetime import datetime, timedelta
+from urllib.parse import quote, urlsplit
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+DEFAULT_MIX = "index=1,analysis=4,chart=3,upload=1"
+CHART_TYPES = ["hourly", "weekly", "hashtag"]
+HASHTAGS = ["#夏", "#海", "#旅行", "#カフェ", "#グルメ", "#写真", "#fashion", "#ootd", "#art", "#travel"]
+
+# シナリオごとの正常なステータスコード
+EXPECTED_STATUS = {
+    "index": {200},
+    "analysis": {200, 304},
+    "revalidate": {200, 304},
+    "chart": {200},
+    "upload": {302},
+}
+
+# 子プロセスで起動するサーバー（データは一時ディレクトリに保存する）
+SERVER = r"""
+import logging, sys
+import app
+
+data_dir, snapshot_dir, port, snapshots = sys.argv[1], sys.argv[2], int(sys.argv[3]), sys.argv[4] == "1"
+app.app.config.update(UPLOAD_FOLDER=data_dir, SNAPSHOT_FOLDER=snapshot_dir, SNAPSHOT_ENABLED=snapshots)
+logging.getLogger("werkzeug").setLevel(logging.ERROR)
+app.app.run(host="127.0.0.1", port=port, threaded=True, use_reloader=False)
+"""
+
+
+def synthetic_csv(rows, seed=0):
+    """指定した行数の合成データセット（必須列・任意列を含むCSV）を作成する"""
+    rng = random.Random(seed)
+    start = datetime(2024, 1, 1)
+    out = io.StringIO()
+    writer = csv.writer(out)
+    writer.writerow(
+        ["post_id", "posted_at", "likes", "comments", "saves", "followers_at_post", "reach", "impressions", "hashtags"]
+    )
+    for i in range(rows):
+        followers = rng.randint(1000, 50000)
+        reach = int(followers * rng.uniform(0.2, 0.9))
+        writer.writerow(
+            [
+                f"post_{i:07d}",
+                (start + timedelta(minutes=rng.randint(0, 60 * 24 * 365))).strftime("%Y-%m-%d %H:%M"),
+                int(reach * rng.uniform(0.01, 0.15)),
+                int(reach * rng.uniform(0.0, 0.02)),
+                int(reach * rng.uniform(0.0, 0.03)),
+                followers,
+                reach,
+                int(reach * rng.uniform(1.0, 1.6)),
+                ",".join(rng.sample(HASHTAGS, rng.randint(0, 4))),
+            ]
+        )
+    return out.getvalue().encode("utf-8")
+
+
+def multipart_body(filename, content, field_name="file"):
+    """ファイル1つを含む multipart/form-data のボディを作成する"""
+    boundary = uuid.uuid4().hex
+    body = b"".join(
+        [
+            f"--{boundary}\r\n".encode(),
+            f'Content-Disposition: form-data; name="{field_name}"; filename="{filename}"\r\n'.encode(),
+            b"Content-Type: text/csv\r\n\r\n",
+            content,
+            f"\r\n--{boundary}--\r\n".encode(),
+        ]
+    )
+    return body, f"multipart/form-data; boundary={boundary}"
+
+
+def parse_mix(value):
+    """ "index=1,analysis=4" 形式のリクエスト割合を解析する"""
+    mix = {}
+    for item in value.split(","):
+        name, _, weight = item.partition("=")
+        name = name.strip()
+        if name not in EXPECTED_STATUS:
+            raise argparse.ArgumentTypeError(f"不明なシナリオ: {name}（指定可能: {', '.join(EXPECTED_STATUS)}）")
+        mix[name] = float(weight or 1)
+    return mix
+
+
+def percentile(sorted_values, p):
+    """ソート済みの値の百分位数（最近傍順位法）"""
+    if not sorted_values:
+        return None
+    rank = max(1, int(round(p / 100 * len(sorted_values) + 0.5)))
+    return sorted_values[min(rank, len(sorted_values)) - 1]
+
+
+class HttpConnection:
+    """
+    1本のHTTP/1.1接続
+
+    サーバーがkeep-aliveに対応していれば接続を再利用し、そうでなければ
+    リクエストごとに接続し直す。
+    """
+
+    def __init__(self, host, port):
+        self.host = host
+        self.port = port
+        self.reader = None
+        self.writer = None
+
+    async def close(self):
+        if self.writer is not None:
+            self.writer.close()
+            try:
+                await self.writer.wait_closed()
+            except OSError:
+                pass
+        self.reader = self.writer = None
+
+    async def request(self, method, path, headers=None, body=b""):
+        """
+        リクエストを送信してレスポンス全体を受信する
+
+        Returns:
+            tuple: (ステータスコード, ヘッダーの辞書, ボディ, 最初の1バイトまでの秒数)
+        """
+        if self.writer is None:
+            self.reader, self.writer = await asyncio.open_connection(self.host, self.port)
+
+        lines = [f"{method} {path} HTTP/1.1", f"Host: {self.host}:{self.port}", "Connection: keep-alive"]
+        for name, value in (headers or {}).items():
+            lines.append(f"{name}: {value}")
+        if body or method == "POST":
+            lines.append(f"Content-Length: {len(body)}")
+        start = time.perf_counter()
+        self.writer.write(("\r\n".join(lines) + "\r\n\r\n").encode("latin-1") + body)
+        await self.writer.drain()
+
+        status_line = await self.reader.readline()
+        ttfb = time.perf_counter() - start
+        if not status_line:
+            raise ConnectionError("サーバーが接続を閉じました")
+        version, status = status_line.decode("latin-1").split()[:2]
+        status = int(status)
+
+        response_headers = {}
+        while True:
+            line = await self.reader.readline()
+            if line in (b"\r\n", b"\n", b""):
+                break
+            name, _, value = line.decode("latin-1").partition(":")
+            response_headers[name.strip().lower()] = value.strip()
+
+        keep_alive = version == "HTTP/1.1" and response_headers.get("connection", "").lower() != "close"
+        if method == "HEAD" or status in (204, 304) or 100 <= status < 200:
+            content = b""
+        elif "content-length" in response_headers:
+            content = await self.reader.readexactly(int(response_headers["content-length"]))
+        elif response_headers.get("transfer-encoding", "").lower() == "chunked":
+            content = await self._read_chunked()
+        else:
+            content = await self.reader.read()
+            keep_alive = False
+
+        if not keep_alive:
+            await self.close()
+        return status, response_headers, content, ttfb
+
+    async def _read_chunked(self):
+        parts = []
+        while True:
+            size = int((await self.reader.readline()).split(b";")[0], 16)
+            if size == 0:
+                while (await self.reader.readline()) not in (b"\r\n", b"\n", b""):
+                    pass
+                return b"".join(parts)
+            parts.append(await self.reader.readexactly(size))
+            await self.reader.readline()
+
+
+class Scenario:
+    """1つのデータセットに対するリクエストの組み立て"""
+
+    def __init__(self, filename, upload_body, upload_content_type):
+        self.filename = filename
+        self.upload_body = upload_body
+        self.upload_content_type = upload_content_type
+        self.etag = None
+
+    def build(self, name, rng):
+        """シナリオ名から (メソッド, パス, ヘッダー, ボディ) を作成する"""
+        if name == "index":
+            return "GET", "/", {}, b""
+        if name == "analysis":
+            return "GET", f"/analysis/{quote(self.filename)}", {}, b""
+        if name == "revalidate":
+            headers = {"If-None-Match": self.etag} if self.etag else {}
+            return "GET", f"/analysis/{quote(self.filename)}", headers, b""
+        if name == "chart":
+            chart_type = rng.choice(CHART_TYPES)
+            return "GET", f"/api/chart/{chart_type}?filename={quote(self.filename)}", {}, b""
+        if name == "upload":
+            return "POST", "/upload", {"Content-Type": self.upload_content_type}, self.upload_body
+        raise ValueError(name)
+
+
+async def setup_dataset(host, port, rows, seed):
+    """合成データセットをアップロードし、シナリオを作成する"""
+    content = synthetic_csv(rows, seed=seed)
+    body, content_type = multipart_body(f"loadtest_{rows}.csv", content)
+    conn = HttpConnection(host, port)
+    try:
+        status, headers, _, _ = await conn.request("POST", "/upload", {"Content-Type": content_type}, body)
+        location = headers.get("location", "")
+        if status != 302 or "/analysis/" not in location:
+            raise RuntimeError(f"アップロードに失敗しました（{rows}行）: status={status} location={location}")
+        filename = urlsplit(location).path.rsplit("/", 1)[-1]
+        scenario = Scenario(filename, body, content_type)
+
+        # 初回の分析（スナップショット作成）は計測対象外にしてETagを取得する
+        start = time.perf_counter()
+        status, headers, _, _ = await conn.request("GET", f"/analysis/{filename}")
+        first_analysis = time.perf_counter() - start
+        status, headers, _, _ = await conn.request("GET", f"/analysis/{filename}")
+        scenario.etag = headers.get("etag")
+        return scenario, len(content), first_analysis
+    finally:
+        await conn.close()
+
+
+async def run_load(host, port, scenario, mix, concurrency, duration, seed):
+    """指定した同時接続数・時間で負荷をかけ、シナリオごとの計測結果を返す"""
+    names = list(mix)
+    weights = [mix[name] for name in names]
+    samples = {name: {"latency": [], "ttfb": [], "errors": 0} for name in names}
+    deadline = time.perf_counter() + duration
+
+    async def worker(index):
+        rng = random.Random(seed * 1000 + index)
+        conn = HttpConnection(host, port)
+        try:
+            while time.perf_counter() < deadline:
+                name = rng.choices(names, weights)[0]
+                method, path, headers, body = scenario.build(name, rng)
+                start = time.perf_counter()
+                try:
+                    status, _, _, ttfb = await conn.request(method, path, headers, body)
+                except (OSError, ConnectionError, asyncio.IncompleteReadError, ValueError):
+                    samples[name]["errors"] += 1
+                    await conn.close()
+                    continue
+                elapsed = time.perf_counter() - start
+                if status not in EXPECTED_STATUS[name]:
+                    samples[name]["errors"] += 1
+                    continue
+                samples[name]["latency"].append(elapsed)
+                samples[name]["ttfb"].append(ttfb)
+        finally:
+            await conn.close()
+
+    started = time.perf_counter()
+    await asyncio.gather(*(worker(i) for i in range(concurrency)))
+    elapsed = time.perf_counter() - started
+    return samples, elapsed
+
+
+def summarize(samples, elapsed):
+    """計測結果をシナリオごとの統計に集計する"""
+    summary = {}
+    for name, sample in samples.items():
+        latency = sorted(sample["latency"])
+        ttfb = sorted(sample["ttfb"])
+        summary[name] = {
+            "requests": len(latency),
+            "errors": sample["errors"],
+            "rps": round(len(latency) / elapsed, 2) if elapsed else 0,
+            "p50_ms": _ms(percentile(latency, 50)),
+            "p95_ms": _ms(percentile(latency, 95)),
+            "p99_ms": _ms(percentile(latency, 99)),
+            "max_ms": _ms(latency[-1] if latency else None),
+            "ttfb_p50_ms": _ms(percentile(ttfb, 50)),
+        }
+    total = sum(item["requests"] for item in summary.values())
+    summary["total"] = {
+        "requests": total,
+        "errors": sum(item["errors"] for item in summary.values()),
+        "rps": round(total / elapsed, 2) if elapsed else 0,
+    }
+    return summary
+
+
+def _ms(seconds):
+    return None if seconds is None else round(seconds * 1000, 2)
+
+
+def print_report(rows, csv_bytes, first_analysis, summary):
+    print(f"\n=== データセット {rows:,}行（{csv_bytes / (1024 * 1024):.1f}MB、初回分析 {first_analysis * 1000:.0f} ms） ===")
+    # 全角文字は表示幅が揃わないため、表の見出しは英字にする
+    print(f"{'scenario':<12}{'count':>8}{'errors':>8}{'req/s':>10}{'p50':>10}{'p95':>10}{'p99':>10}{'max':>10}{'TTFB p50':>10}")
+    fmt = lambda v: "-" if v is None else f"{v:.1f}"
+    for name, item in summary.items():
+        if name == "total":
+            continue
+        print(
+            f"{name:<12}{item['requests']:>8}{item['errors']:>8}{item['rps']:>10.1f}"
+            f"{fmt(item['p50_ms']):>10}{fmt(item['p95_ms']):>10}{fmt(item['p99_ms']):>10}"
+            f"{fmt(item['max_ms']):>10}{fmt(item['ttfb_p50_ms']):>10}"
+        )
+    total = summary["total"]
+    print(f"{'total':<12}{total['requests']:>8}{total['errors']:>8}{total['rps']:>10.1f}   （レイテンシの単位: ms）")
+
+
+def free_port():
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+def start_server(workdir, snapshots):
+    """一時ディレクトリをデータ保存先にしてアプリを起動し、接続できるまで待つ"""
+    port = free_port()
+    data_dir = os.path.join(workdir, "data")
+    snapshot_dir = os.path.join(workdir, "snapshots")
+    os.makedirs(data_dir)
+    process = subprocess.Popen(
+        [sys.executable, "-c", SERVER, data_dir, snapshot_dir, str(port), "1" if snapshots else "0"],
+        cwd=ROOT,
+        stdout=subprocess.DEVNULL,
+        stderr=subprocess.PIPE,
+    )
+    deadline = time.time() + 30
+    while time.time() < deadline:
+        if process.poll() is not None:
+            raise RuntimeError(f"サーバーの起動に失敗しました:\n{process.stderr.read().decode(errors='replace')}")
+        try:
+            with socket.create_connection(("127.0.0.1", port), timeout=0.5):
+                return process, port
+        except OSError:
+            time.sleep(0.1)
+    process.terminate()
+    raise RuntimeError("サーバーが起動しませんでした")
+
+
+async def run(args, host, port):
+    reports = []
+    for i, rows in enumerate(args.sizes):
+        scenario, csv_bytes, first_analysis = await setup_dataset(host, port, rows, seed=args.seed + i)
+        samples, elapsed = await run_load(
+            host, port, scenario, args.mix, args.concurrency, args.duration, seed=args.seed + i
+        )
+        summary = summarize(samples, elapsed)
+        print_report(rows, csv_bytes, first_analysis, summary)
+        reports.append(
+            {
+                "rows": rows,
+                "csv_bytes": csv_bytes,
+                "first_analysis_ms": _ms(first_analysis),
+                "scenarios": summary,
+            }
+        )
+    return reports
+
+
+def main():
+    parser = argparse.ArgumentParser(description="HTTPルートの負荷テスト")
+    parser.add_argument(
+        "--sizes",
+        type=lambda v: [int(x) for x in v.split(",")],
+        default=[1000, 10000],
+        help="合成データセットの行数（カンマ区切り）",
+    )
+    parser.add_argument("--concurrency", type=int, default=8, help="同時接続数")
+    parser.add_argument("--duration", type=float, default=10, help="データセットごとの計測時間（秒）")
+    parser.add_argument("--mix", type=parse_mix, default=parse_mix(DEFAULT_MIX), help="シナリオごとのリクエスト割合")
+    parser.add_argument("--no-snapshots", action="store_true", help="スナップショットを無効にして起動する")
+    parser.add_argument("--url", help="起動済みのサーバーに対して計測する（例: http://127.0.0.1:8000）")
+    parser.add_argument("--seed", type=int, default=0, help="乱数シード")
+    parser.add_argument("--output", help="結果をJSON Lines形式で追記するファイル")
+    args = parser.parse_args()
+
+    process = None
+    with tempfile.TemporaryDirectory(prefix="loadtest-") as workdir:
+        if args.url:
+            url = urlsplit(args.url)
+            host, port = url.hostname, url.port or 80
+        else:
+            process, port = start_server(workdir, snapshots=not args.no_snapshots)
+            host = "127.0.0.1"
+
+        try:
+            reports = asyncio.run(run(args, host, port))
+        finally:
+            if process is not None:
+                process.terminate()
+                process.wait()
+
+    if args.output:
+        record = {
+            "timestamp": datetime.now().isoformat(timespec="seconds"),
+            "python": sys.version.split()[0],
+            "concurrency": args.concurrency,
+            "duration_s": args.duration,
+            "mix": args.mix,
+            "snapshots": not args.no_snapshots,
+            "target": args.url or "local",
+            "datasets": reports,
+        }
+        with open(args.output, "a", encoding="utf-8") as f:
+            f.write(json.dumps(record, ensure_ascii=False) + "\n")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,159 @@
+import pandas as pd
+
+ACCOUNT_COLUMN = "account_id"
+
+WEEKDAY_ORDER = ["Monday", "Tuesday", "Wednesday", "Thursday", "Friday", "Saturday", "Sunday"]
+WEEKDAY_JP = {
+    "Monday": "月曜日",
+    "Tuesday": "火曜日",
+    "Wednesday": "水曜日",
+    "Thursday": "木曜日",
+    "Friday": "金曜日",
+    "Saturday": "土曜日",
+    "Sunday": "日曜日",
+}
+
+
+def count_accounts(df):
+    """データセットに含まれるアカウント数（アカウント列がない場合は0）"""
+    if ACCOUNT_COLUMN not in df.columns:
+        return 0
+    return int(df[ACCOUNT_COLUMN].nunique())
+
+
+def summary_by_account(df):
+    """アカウント別のサマリー統計（calculate_summary_stats と同じ指標）"""
+    columns = {
+        "avg_er": ("er_percentage", "mean"),
+        "max_er": ("er_percentage", "max"),
+        "min_er": ("er_percentage", "min"),
+        "avg_likes": ("likes", "mean"),
+        "avg_comments": ("comments", "mean"),
+        "avg_saves": ("saves", "mean"),
+        "avg_engagement": ("engagement_total", "mean"),
+    }
+    aggregations = {name: spec for name, spec in columns.items() if spec[0] in df.columns}
+    grouped = df.groupby(ACCOUNT_COLUMN, sort=True)
+    summary = grouped.agg(**aggregations) if aggregations else pd.DataFrame(index=grouped.size().index)
+    summary.insert(0, "total_posts", grouped.size())
+    return summary.reset_index()
+
+
+def hourly_by_account(df):
+    """アカウント×時間帯別の平均ERと投稿数"""
+    hourly = df.groupby([ACCOUNT_COLUMN, "hour"])["er_percentage"].agg(["mean", "count"]).round(2)
+    hourly.columns = ["平均ER", "投稿数"]
+    return hourly.reset_index()
+
+
+def weekday_by_account(df):
+    """アカウント×曜日別の平均ERと投稿数（曜日順）"""
+    weekday = df.groupby([ACCOUNT_COLUMN, "weekday"])["er_percentage"].agg(["mean", "count"]).round(2)
+    weekday.columns = ["平均ER", "投稿数"]
+    weekday = weekday.reset_index()
+    weekday["weekday"] = pd.Categorical(weekday["weekday"], categories=WEEKDAY_ORDER, ordered=True)
+    weekday = weekday.sort_values([ACCOUNT_COLUMN, "weekday"])
+    weekday["weekday"] = weekday["weekday"].astype(str)
+    weekday["曜日"] = weekday["weekday"].map(WEEKDAY_JP)
+    return weekday.reset_index(drop=True)
+
+
+def hashtags_by_account(df, top_n=10):
+    """アカウント別のハッシュタグ使用回数（上位 top_n 件、simple_hashtag_summary と同じ分割方法）"""
+    tags = df[[ACCOUNT_COLUMN, "hashtags"]].dropna()
+    tags = tags.assign(hashtag=tags["hashtags"].astype(str).str.split(",")).explode("hashtag")
+    tags["hashtag"] = tags["hashtag"].str.strip().str.lower()
+    tags = tags[tags["hashtag"].fillna("") != ""]
+
+    counts = tags.groupby([ACCOUNT_COLUMN, "hashtag"]).size().rename("使用回数").reset_index()
+    counts = counts.sort_values([ACCOUNT_COLUMN, "使用回数"], ascending=[True, False], kind="stable")
+    return counts.groupby(ACCOUNT_COLUMN).head(top_n).rename(columns={"hashtag": "ハッシュタグ"})
+
+
+def rankings_by_account(df, top=True, n=10):
+    """アカウント別のERランキング（上位または下位 n 件）"""
+    ranked = df.dropna(subset=["er_percentage"])
+    ranked = ranked.sort_values([ACCOUNT_COLUMN, "er_percentage"], ascending=[True, not top], kind="stable")
+    return ranked.groupby(ACCOUNT_COLUMN).head(n)
+
+
+def analyze_by_account(df, top_n=10):
+    """
+    アカウント列でデータを分割し、全アカウントの集計をまとめて計算する
+
+    アカウントごとにデータを分けて分析を繰り返すのではなく、アカウント列を
+    キーに含めたgroupbyで全アカウント分を一度に集計する。
+
+    Args:
+        df: アカウント列（account_id）を含む前処理済みのDataFrame
+        top_n: ハッシュタグ・ランキングの件数
+
+    Returns:
+        dict: 集計結果（アカウント列がない場合は error を含む辞書）
+    """
+    if df.empty or ACCOUNT_COLUMN not in df.columns or "er_percentage" not in df.columns:
+        return {"error": "アカウント別の分析に必要なデータが不足しています"}
+
+    df = df.dropna(subset=[ACCOUNT_COLUMN])
+    result = {
+        "summary": summary_by_account(df),
+        "top_rankings": rankings_by_account(df, top=True, n=top_n),
+        "bottom_rankings": rankings_by_account(df, top=False, n=top_n),
+    }
+    if "hour" in df.columns:
+        result["hourly"] = hourly_by_account(df)
+    if "weekday" in df.columns:
+        result["weekly"] = weekday_by_account(df)
+    if "hashtags" in df.columns:
+        result["hashtags"] = hashtags_by_account(df, top_n=top_n)
+    return result
+
+
+def compare_accounts(partitioned):
+    """
+    アカウント比較用の一覧を作成する
+
+    Args:
+        partitioned: analyze_by_account の結果
+
+    Returns:
+        list: アカウントごとの比較データ（平均ERの高い順）
+    """
+    summary = partitioned["summary"]
+
+    # ERが全て欠損（フォロワー数0など）のアカウントは idxmax がNaNになるため、欠損行を除いて求める
+    best_hours = {}
+    if "hourly" in partitioned:
+        hourly = partitioned["hourly"].dropna(subset=["平均ER"])
+        if not hourly.empty:
+            best = hourly.loc[hourly.groupby(ACCOUNT_COLUMN)["平均ER"].idxmax()]
+            best_hours = dict(zip(best[ACCOUNT_COLUMN], best["hour"]))
+
+    best_weekdays = {}
+    if "weekly" in partitioned:
+        weekly = partitioned["weekly"].dropna(subset=["平均ER"])
+        if not weekly.empty:
+            best = weekly.loc[weekly.groupby(ACCOUNT_COLUMN)["平均ER"].idxmax()]
+            best_weekdays = dict(zip(best[ACCOUNT_COLUMN], best["曜日"]))
+
+    top_tags = {}
+    if "hashtags" in partitioned and not partitioned["hashtags"].empty:
+        top_tags = partitioned["hashtags"].groupby(ACCOUNT_COLUMN)["ハッシュタグ"].first().to_dict()
+
+    comparison = []
+    for _, row in summary.sort_values("avg_er", ascending=False).iterrows():
+        account = row[ACCOUNT_COLUMN]
+        comparison.append(
+            {
+                "account_id": account,
+                "total_posts": int(row["total_posts"]),
+                "avg_er": row.get("avg_er"),
+                "max_er": row.get("max_er"),
+                "min_er": row.get("min_er"),
+                "avg_engagement": row.get("avg_engagement"),
+                "best_hour": int(best_hours[account]) if account in best_hours else None,
+                "best_weekday": best_weekdays.get(account),
+                "top_hashtag": top_tags.get(account),
+            }
+        )
+    return comparison
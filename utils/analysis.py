@@ -1,6 +1,20 @@
 import pandas as pd
 import numpy as np
 
+from utils.engagement import compute_rates, resolve_definitions, summarize_rates
+from utils.posting_slots import optimize_posting_slots
+
+# 改善提案のブートストラップ信頼区間の設定
+BOOTSTRAP_RESAMPLES = 2000
+BOOTSTRAP_CONFIDENCE = 0.95
+BOOTSTRAP_SEED = 0
+# 比較対象とするグループの最小投稿数（1件では区間を推定できない）
+BOOTSTRAP_MIN_GROUP_SIZE = 2
+# 1ブロックで生成するリサンプル要素数の上限（リサンプル回数 × データ数）
+BOOTSTRAP_MAX_ELEMENTS = 4_000_000
+# 1グループあたりの再標本化に使う最大件数
+BOOTSTRAP_MAX_GROUP_SAMPLE = 500
+
 
 def calculate_summary_stats(df):
     """サマリー統計を計算"""
@@ -21,8 +35,18 @@ def calculate_summary_stats(df):
     return stats
 
 
-def calculate_engagement_metrics(df):
-    """エンゲージメント指標を計算"""
+def calculate_engagement_metrics(df, custom_definitions=None):
+    """
+    エンゲージメント指標を計算
+
+    フォロワー数・リーチ数・インプレッション数ベースと追加のER定義を
+    engagement.compute_rates で一度にまとめて計算し、同じ配列から統計を求める。
+    分母が0以下・欠損の投稿は各定義の統計から除外する（DataFrameは変更しない）。
+
+    Args:
+        df: 前処理済みのDataFrame
+        custom_definitions: 追加のER定義（engagement.resolve_definitions を参照）
+    """
     if df.empty:
         return {}
 
@@ -31,47 +55,26 @@ def calculate_engagement_metrics(df):
     if not all(col in df.columns for col in required_columns):
         return {"error": "必要なデータが不足しています"}
 
-    # エンゲージメント数を計算
-    df["engagement_total"] = df["likes"] + df["comments"] + df["saves"]
-
-    # フォロワー数ベースのエンゲージメント率
-    df["er_by_followers"] = (df["engagement_total"] / df["followers_at_post"] * 100).round(2)
-
-    metrics = {
-        "フォロワー数ベース": {
-            "平均ER": f"{df['er_by_followers'].mean():.2f}%",
-            "最高ER": f"{df['er_by_followers'].max():.2f}%",
-            "最低ER": f"{df['er_by_followers'].min():.2f}%",
-            "中央値ER": f"{df['er_by_followers'].median():.2f}%",
-            "計算式": "（いいね＋コメント＋保存）÷ フォロワー数 × 100",
-        }
-    }
-
-    # インプレッション数ベースのエンゲージメント率（インプレッション列が存在する場合）
-    if "impressions" in df.columns:
-        # インプレッション数が0でない行のみを対象
-        valid_impressions = df["impressions"] > 0
-        if valid_impressions.any():
-            df.loc[valid_impressions, "er_by_impressions"] = (
-                df.loc[valid_impressions, "engagement_total"] / df.loc[valid_impressions, "impressions"] * 100
-            ).round(2)
-
-            # 有効なデータのみで統計を計算
-            valid_data = df[valid_impressions]["er_by_impressions"]
-            metrics["インプレッション数ベース"] = {
-                "平均ER": f"{valid_data.mean():.2f}%",
-                "最高ER": f"{valid_data.max():.2f}%",
-                "最低ER": f"{valid_data.min():.2f}%",
-                "中央値ER": f"{valid_data.median():.2f}%",
-                "計算式": "（いいね＋コメント＋保存）÷ インプレッション数 × 100",
+    definitions = resolve_definitions(df.columns, custom_definitions)
+    summary = summarize_rates(compute_rates(df, definitions))
+
+    metrics = {}
+    for i, (name, _, _, formula) in enumerate(definitions):
+        if summary["count"][i]:
+            metrics[name] = {
+                "平均ER": f"{summary['mean'][i]:.2f}%",
+                "最高ER": f"{summary['max'][i]:.2f}%",
+                "最低ER": f"{summary['min'][i]:.2f}%",
+                "中央値ER": f"{summary['median'][i]:.2f}%",
+                "計算式": formula,
             }
         else:
-            metrics["インプレッション数ベース"] = {
+            metrics[name] = {
                 "平均ER": "データなし",
                 "最高ER": "データなし",
                 "最低ER": "データなし",
                 "中央値ER": "データなし",
-                "計算式": "（いいね＋コメント＋保存）÷ インプレッション数 × 100",
+                "計算式": formula,
             }
 
     return metrics
@@ -98,7 +101,17 @@ def avg_by_hour(df):
     if df.empty or "hour" not in df.columns or "er_percentage" not in df.columns:
         return pd.DataFrame()
 
-    hourly_avg = df.groupby("hour")["er_percentage"].agg(["mean", "count"]).round(2)
+    return format_hourly(df.groupby("hour")["er_percentage"].agg(["mean", "count"]))
+
+
+def format_hourly(hourly_avg):
+    """
+    時間帯別の集計結果を表示用に整形
+
+    Args:
+        hourly_avg: hour をインデックス、mean・count を列に持つ集計結果
+    """
+    hourly_avg = hourly_avg.round(2)
     hourly_avg.columns = ["平均ER", "投稿数"]
     hourly_avg = hourly_avg.reset_index()
     hourly_avg["時間"] = hourly_avg["hour"].astype(str) + "時"
@@ -111,8 +124,18 @@ def avg_by_weekday(df):
     if df.empty or "weekday" not in df.columns or "er_percentage" not in df.columns:
         return pd.DataFrame()
 
+    return format_weekday(df.groupby("weekday")["er_percentage"].agg(["mean", "count"]))
+
+
+def format_weekday(weekday_avg):
+    """
+    曜日別の集計結果を曜日順に並べて表示用に整形
+
+    Args:
+        weekday_avg: weekday をインデックス、mean・count を列に持つ集計結果
+    """
     weekday_order = ["Monday", "Tuesday", "Wednesday", "Thursday", "Friday", "Saturday", "Sunday"]
-    weekday_avg = df.groupby("weekday")["er_percentage"].agg(["mean", "count"]).round(2)
+    weekday_avg = weekday_avg.round(2)
     weekday_avg.columns = ["平均ER", "投稿数"]
     weekday_avg = weekday_avg.reset_index()
 
@@ -259,6 +282,11 @@ def analyze_content_patterns(df):
 
             content_analysis["time_patterns"] = category_performance
 
+    # 曜日 × 時間の168枠を平滑化した予想ERで投稿枠をランキング
+    slot_patterns = optimize_posting_slots(df)
+    if slot_patterns:
+        content_analysis["slot_patterns"] = slot_patterns
+
     # エンゲージメント率の分布分析
     er_stats = df["er_percentage"].describe()
     content_analysis["engagement_patterns"] = {
@@ -272,12 +300,19 @@ def analyze_content_patterns(df):
     return content_analysis
 
 
-def generate_content_recommendations(df):
-    """内容分析に基づく具体的な改善提案を生成"""
+def generate_content_recommendations(df, content_analysis=None):
+    """
+    内容分析に基づく具体的な改善提案を生成
+
+    Args:
+        df: 分析対象のDataFrame
+        content_analysis: 計算済みの analyze_content_patterns の結果（省略時は計算する）
+    """
     if df.empty or "er_percentage" not in df.columns:
         return {"error": "データが不足しています"}
 
-    content_analysis = analyze_content_patterns(df)
+    if content_analysis is None:
+        content_analysis = analyze_content_patterns(df)
     if "error" in content_analysis:
         return content_analysis
 
@@ -322,8 +357,28 @@ def generate_content_recommendations(df):
                 }
             )
 
-    # 時間帯戦略の提案
-    if "time_patterns" in content_analysis and content_analysis["time_patterns"]:
+    # 時間帯戦略の提案（投稿枠の予想ERがあればそれを優先）
+    if content_analysis.get("slot_patterns"):
+        slots = content_analysis["slot_patterns"]
+        best = slots[0]
+        best_slot = f"{best['曜日']}{best['hour']}時"
+        runners_up = "、".join(f"{slot['曜日']}{slot['hour']}時" for slot in slots[1:3])
+
+        recommendations.append(
+            {
+                "category": "投稿時間戦略",
+                "title": f"最適な時間帯での投稿",
+                "description": f"曜日・時間帯ごとのERを前後の時間帯と合わせて平滑化すると、{best_slot}の予想ERが{best['expected_er']}%で最も高くなっています。",
+                "recommendation": f"重要な投稿は{best_slot}頃に投稿することをお勧めします。",
+                "priority": "高",
+                "action_items": [
+                    f"特に{best_slot}を投稿のゴールデンタイムとして設定",
+                    *([f"次点の{runners_up}も投稿枠の候補にする"] if runners_up else []),
+                    "投稿前の時間帯分析を継続的に実施",
+                ],
+            }
+        )
+    elif "time_patterns" in content_analysis and content_analysis["time_patterns"]:
         time_patterns = content_analysis["time_patterns"]
 
         # 最も効果的な時間帯カテゴリを見つける
@@ -441,6 +496,117 @@ def generate_content_recommendations(df):
     }
 
 
+def bootstrap_group_means(values, groups, n_resamples=BOOTSTRAP_RESAMPLES, seed=BOOTSTRAP_SEED):
+    """
+    グループごとの平均値をブートストラップ法で再標本化する
+
+    全グループ・全リサンプルを2次元配列でまとめて計算する。各要素について
+    「同じグループ内のランダムな位置」を一括で生成し、グループごとの合計を
+    np.add.reduceat で求める。メモリ使用量を抑えるため、リサンプルは
+    BOOTSTRAP_MAX_ELEMENTS 要素ずつのブロックで処理する。
+
+    BOOTSTRAP_MAX_GROUP_SAMPLE 件を超えるグループは無作為に選んだ部分標本で
+    再標本化し、平均値のばらつきを元の件数に合わせて縮小する。
+
+    Args:
+        values: 値の配列（欠損値を含まないこと）
+        groups: 各値のグループラベル
+        n_resamples: リサンプル回数
+        seed: 乱数シード（同じデータには同じ結果を返す）
+
+    Returns:
+        tuple: (グループラベル, グループごとの件数, 形状 (n_resamples, グループ数) の平均値配列)
+    """
+    rng = np.random.default_rng(seed)
+    values = np.asarray(values, dtype=float)
+    codes, labels = pd.factorize(np.asarray(groups), sort=True)
+    n_groups = len(labels)
+
+    sizes = np.bincount(codes, minlength=n_groups)
+    group_means = np.bincount(codes, weights=values, minlength=n_groups) / sizes
+
+    # グループ順に並べ替え（同じグループ内は無作為な順序）、大きなグループは先頭の部分標本のみ残す
+    order = np.lexsort((rng.random(len(values)), codes))
+    sorted_codes = codes[order]
+    starts = np.concatenate(([0], np.cumsum(sizes)[:-1]))
+    keep = np.arange(len(values)) - starts[sorted_codes] < BOOTSTRAP_MAX_GROUP_SAMPLE
+    sample_values = values[order][keep]
+    sample_codes = sorted_codes[keep]
+
+    sample_sizes = np.minimum(sizes, BOOTSTRAP_MAX_GROUP_SAMPLE)
+    sample_starts = np.concatenate(([0], np.cumsum(sample_sizes)[:-1]))
+    sample_means = np.bincount(sample_codes, weights=sample_values, minlength=n_groups) / sample_sizes
+    element_starts = sample_starts[sample_codes]
+    element_sizes = sample_sizes[sample_codes]
+
+    n_values = len(sample_values)
+    block = max(1, BOOTSTRAP_MAX_ELEMENTS // max(n_values, 1))
+    means = np.empty((n_resamples, n_groups))
+    for first in range(0, n_resamples, block):
+        count = min(block, n_resamples - first)
+        indices = element_starts + (rng.random((count, n_values)) * element_sizes).astype(np.int64)
+        sums = np.add.reduceat(sample_values[indices], sample_starts, axis=1)
+        means[first : first + count] = sums / sample_sizes
+
+    # 部分標本の平均のばらつき（分散 ∝ 1/件数）を元の件数に合わせる
+    scale = np.sqrt(sample_sizes / sizes)
+    means = group_means + (means - sample_means) * scale
+
+    return labels, sizes, means
+
+
+def compare_best_worst(values, groups, min_size=BOOTSTRAP_MIN_GROUP_SIZE):
+    """
+    平均ERが最も高いグループと最も低いグループをブートストラップ信頼区間付きで比較する
+
+    Args:
+        values: ERの配列
+        groups: 各ERのグループラベル（時間帯・曜日・ハッシュタグなど）
+        min_size: 比較対象とするグループの最小件数
+
+    Returns:
+        dict or None: 比較できるグループが2つ未満の場合はNone
+    """
+    values = np.asarray(values, dtype=float)
+    groups = np.asarray(groups)
+    valid = ~np.isnan(values)
+    values, groups = values[valid], groups[valid]
+    if len(values) == 0:
+        return None
+
+    labels, sizes, boot_means = bootstrap_group_means(values, groups)
+    codes = pd.factorize(groups, sort=True)[0]
+    means = np.round(np.bincount(codes, weights=values, minlength=len(labels)) / sizes, 2)
+
+    eligible = np.flatnonzero(sizes >= min_size)
+    if len(eligible) < 2:
+        return None
+
+    best = eligible[np.argmax(means[eligible])]
+    worst = eligible[np.argmin(means[eligible])]
+
+    alpha = (1 - BOOTSTRAP_CONFIDENCE) / 2
+    quantiles = [alpha, 1 - alpha]
+    best_ci = np.quantile(boot_means[:, best], quantiles)
+    worst_ci = np.quantile(boot_means[:, worst], quantiles)
+    difference_ci = np.quantile(boot_means[:, best] - boot_means[:, worst], quantiles)
+
+    return {
+        "best": labels[best],
+        "worst": labels[worst],
+        "best_er": float(means[best]),
+        "worst_er": float(means[worst]),
+        "confidence_interval": {
+            "level": int(round(BOOTSTRAP_CONFIDENCE * 100)),
+            "best": [round(float(x), 2) for x in best_ci],
+            "worst": [round(float(x), 2) for x in worst_ci],
+            "difference": [round(float(x), 2) for x in difference_ci],
+        },
+        # 差の信頼区間が0を含まない場合のみ有意とみなす
+        "significant": bool(difference_ci[0] > 0),
+    }
+
+
 def generate_improvement_suggestions(df):
     """エンゲージメント率向上のための改善提案を生成"""
     if df.empty or "er_percentage" not in df.columns:
@@ -450,13 +616,13 @@ def generate_improvement_suggestions(df):
 
     # 1. 時間帯分析
     if "hour" in df.columns:
-        hourly_stats = df.groupby("hour")["er_percentage"].agg(["mean", "count"]).round(2)
-        best_hour = hourly_stats["mean"].idxmax()
-        worst_hour = hourly_stats["mean"].idxmin()
-        best_er = hourly_stats.loc[best_hour, "mean"]
-        worst_er = hourly_stats.loc[worst_hour, "mean"]
+        hourly_data = df.dropna(subset=["hour"])
+        comparison = compare_best_worst(hourly_data["er_percentage"], hourly_data["hour"].astype(int))
 
-        if best_er > worst_er * 1.2:  # 20%以上の差がある場合
+        # 20%以上の差があり、かつ統計的に有意な場合
+        if comparison and comparison["significant"] and comparison["best_er"] > comparison["worst_er"] * 1.2:
+            best_hour, worst_hour = comparison["best"], comparison["worst"]
+            best_er, worst_er = comparison["best_er"], comparison["worst_er"]
             suggestions.append(
                 {
                     "category": "時間帯",
@@ -464,16 +630,14 @@ def generate_improvement_suggestions(df):
                     "description": f"{best_hour}時の平均ERは{best_er}%で、{worst_hour}時の{worst_er}%より{((best_er/worst_er-1)*100):.1f}%高いです。",
                     "recommendation": f"投稿を{best_hour}時頃に集中させることで、エンゲージメント率の向上が期待できます。",
                     "priority": "高",
+                    "confidence_interval": comparison["confidence_interval"],
                 }
             )
 
     # 2. 曜日分析
     if "weekday" in df.columns:
-        weekday_stats = df.groupby("weekday")["er_percentage"].agg(["mean", "count"]).round(2)
-        best_weekday = weekday_stats["mean"].idxmax()
-        worst_weekday = weekday_stats["mean"].idxmin()
-        best_er = weekday_stats.loc[best_weekday, "mean"]
-        worst_er = weekday_stats.loc[worst_weekday, "mean"]
+        weekday_data = df.dropna(subset=["weekday"])
+        comparison = compare_best_worst(weekday_data["er_percentage"], weekday_data["weekday"])
 
         weekday_jp = {
             "Monday": "月曜日",
@@ -485,7 +649,10 @@ def generate_improvement_suggestions(df):
             "Sunday": "日曜日",
         }
 
-        if best_er > worst_er * 1.15:  # 15%以上の差がある場合
+        # 15%以上の差があり、かつ統計的に有意な場合
+        if comparison and comparison["significant"] and comparison["best_er"] > comparison["worst_er"] * 1.15:
+            best_weekday, worst_weekday = comparison["best"], comparison["worst"]
+            best_er, worst_er = comparison["best_er"], comparison["worst_er"]
             suggestions.append(
                 {
                     "category": "曜日",
@@ -493,6 +660,7 @@ def generate_improvement_suggestions(df):
                     "description": f"{weekday_jp.get(best_weekday, best_weekday)}の平均ERは{best_er}%で、{weekday_jp.get(worst_weekday, worst_weekday)}の{worst_er}%より{((best_er/worst_er-1)*100):.1f}%高いです。",
                     "recommendation": f"重要な投稿は{weekday_jp.get(best_weekday, best_weekday)}に投稿することをお勧めします。",
                     "priority": "中",
+                    "confidence_interval": comparison["confidence_interval"],
                 }
             )
 
@@ -512,25 +680,26 @@ def generate_improvement_suggestions(df):
 
         if hashtag_er_data:
             hashtag_df = pd.DataFrame(hashtag_er_data)
-            hashtag_avg = hashtag_df.groupby("hashtag")["er"].agg(["mean", "count"]).round(2)
-            hashtag_avg = hashtag_avg[hashtag_avg["count"] >= 2]  # 2回以上使用されたハッシュタグのみ
-
-            if not hashtag_avg.empty:
-                best_hashtag = hashtag_avg["mean"].idxmax()
-                best_hashtag_er = hashtag_avg.loc[best_hashtag, "mean"]
-                worst_hashtag = hashtag_avg["mean"].idxmin()
-                worst_hashtag_er = hashtag_avg.loc[worst_hashtag, "mean"]
-
-                if best_hashtag_er > worst_hashtag_er * 1.3:  # 30%以上の差がある場合
-                    suggestions.append(
-                        {
-                            "category": "ハッシュタグ",
-                            "title": f"ハッシュタグ戦略の見直し",
-                            "description": f"#{best_hashtag}の平均ERは{best_hashtag_er}%で、#{worst_hashtag}の{worst_hashtag_er}%より{((best_hashtag_er/worst_hashtag_er-1)*100):.1f}%高いです。",
-                            "recommendation": f"#{best_hashtag}のような効果的なハッシュタグを積極的に使用し、効果の低いハッシュタグは避けることをお勧めします。",
-                            "priority": "中",
-                        }
-                    )
+            comparison = compare_best_worst(hashtag_df["er"], hashtag_df["hashtag"])
+
+            # 30%以上の差があり、かつ統計的に有意な場合
+            if (
+                comparison
+                and comparison["significant"]
+                and comparison["best_er"] > comparison["worst_er"] * 1.3
+            ):
+                best_hashtag, worst_hashtag = comparison["best"], comparison["worst"]
+                best_hashtag_er, worst_hashtag_er = comparison["best_er"], comparison["worst_er"]
+                suggestions.append(
+                    {
+                        "category": "ハッシュタグ",
+                        "title": f"ハッシュタグ戦略の見直し",
+                        "description": f"#{best_hashtag}の平均ERは{best_hashtag_er}%で、#{worst_hashtag}の{worst_hashtag_er}%より{((best_hashtag_er/worst_hashtag_er-1)*100):.1f}%高いです。",
+                        "recommendation": f"#{best_hashtag}のような効果的なハッシュタグを積極的に使用し、効果の低いハッシュタグは避けることをお勧めします。",
+                        "priority": "中",
+                        "confidence_interval": comparison["confidence_interval"],
+                    }
+                )
 
     # 4. エンゲージメント率の全体的な分析
     avg_er = df["er_percentage"].mean()
@@ -0,0 +1,122 @@
+import gzip
+import hashlib
+import json
+import os
+import shutil
+
+from werkzeug.security import safe_join
+
+try:
+    import brotli
+except ImportError:  # requirements.txt に含まれるが、未インストールの環境ではgzipのみ生成する
+    brotli = None
+
+# ビルド対象のディレクトリ（static/ からの相対パス）
+ASSET_DIRS = ["vendor", "css", "js"]
+
+# 事前圧縮する拡張子（woff2などの圧縮済み形式は対象外）
+COMPRESSIBLE_EXTENSIONS = {".js", ".css", ".svg", ".ttf", ".json", ".map"}
+
+DIST_DIR = "dist"
+MANIFEST_NAME = "manifest.json"
+HASH_LENGTH = 12
+
+
+def hashed_name(rel_path, digest):
+    """ファイル名に内容ハッシュを埋め込む（例: plotly.min.js -> plotly.min.<hash>.js）"""
+    root, ext = os.path.splitext(rel_path)
+    return f"{root}.{digest[:HASH_LENGTH]}{ext}"
+
+
+def is_immutable(rel_path, manifest):
+    """長期キャッシュしてよいアセットか判定（ハッシュ付きまたはバージョン固定のvendor配下）"""
+    return rel_path.startswith("vendor/") or rel_path in manifest.values()
+
+
+def _write_compressed(path, data):
+    """gzip（およびbrotli）で事前圧縮したファイルを書き出す"""
+    with open(path + ".gz", "wb") as f:
+        # mtime=0で再ビルド時も同じバイト列にする
+        with gzip.GzipFile(fileobj=f, mode="wb", compresslevel=9, mtime=0) as gz:
+            gz.write(data)
+    if brotli is not None:
+        with open(path + ".br", "wb") as f:
+            f.write(brotli.compress(data, quality=11))
+
+
+def _copy_asset(dist_folder, rel_path, data):
+    """dist配下にアセットを書き出し、必要なら圧縮版も作成"""
+    dest = os.path.join(dist_folder, rel_path)
+    os.makedirs(os.path.dirname(dest), exist_ok=True)
+    with open(dest, "wb") as f:
+        f.write(data)
+    if os.path.splitext(rel_path)[1] in COMPRESSIBLE_EXTENSIONS:
+        _write_compressed(dest, data)
+
+
+def build_assets(static_folder):
+    """
+    静的アセットをビルドして static/dist/ に出力する
+
+    各ファイルについて内容ハッシュ付きのファイル名でコピーし、gzip/brotliの
+    圧縮版を生成する。CSSからの相対参照（Webフォントなど）が解決できるよう、
+    元のファイル名のコピーも同じディレクトリ構成で出力する。
+
+    Args:
+        static_folder: static ディレクトリのパス
+
+    Returns:
+        dict: 元のパス -> ハッシュ付きパスのマニフェスト
+    """
+    dist_folder = os.path.join(static_folder, DIST_DIR)
+    if os.path.isdir(dist_folder):
+        shutil.rmtree(dist_folder)
+
+    manifest = {}
+    for asset_dir in ASSET_DIRS:
+        for root, _, files in os.walk(os.path.join(static_folder, asset_dir)):
+            for name in sorted(files):
+                src = os.path.join(root, name)
+                rel_path = os.path.relpath(src, static_folder).replace(os.sep, "/")
+                with open(src, "rb") as f:
+                    data = f.read()
+
+                target = hashed_name(rel_path, hashlib.sha256(data).hexdigest())
+                _copy_asset(dist_folder, rel_path, data)
+                _copy_asset(dist_folder, target, data)
+                manifest[rel_path] = target
+
+    with open(os.path.join(dist_folder, MANIFEST_NAME), "w", encoding="utf-8") as f:
+        json.dump(manifest, f, indent=2, sort_keys=True)
+
+    return manifest
+
+
+def load_manifest(static_folder):
+    """ビルド済みマニフェストを読み込む（未ビルドの場合は空）"""
+    try:
+        with open(os.path.join(static_folder, DIST_DIR, MANIFEST_NAME), "r", encoding="utf-8") as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return {}
+
+
+def negotiate_encoding(dist_folder, rel_path, accept_encodings):
+    """
+    クライアントが受け付ける圧縮形式のうち、事前圧縮ファイルが存在するものを選ぶ
+
+    Args:
+        dist_folder: static/dist のパス
+        rel_path: dist からの相対パス
+        accept_encodings: リクエストのAccept-Encoding
+
+    Returns:
+        tuple: (配信するファイルの相対パス, Content-Encoding または None)
+    """
+    for encoding, suffix in (("br", ".br"), ("gzip", ".gz")):
+        if encoding not in accept_encodings:
+            continue
+        path = safe_join(dist_folder, rel_path + suffix)
+        if path is not None and os.path.isfile(path):
+            return rel_path + suffix, encoding
+    return rel_path, None
@@ -5,13 +5,25 @@ import pandas as pd
 import json
 
 
-def create_hourly_chart(df):
-    """時間帯別ERチャートを作成"""
+def _mean_error(grouped):
+    """グループ別平均の95%誤差範囲の半幅（1件のみのグループは0）"""
+    return (1.96 * grouped.std() / grouped.count() ** 0.5).fillna(0).round(2)
+
+
+def create_hourly_chart(df, error_bars=False):
+    """
+    時間帯別ERチャートを作成
+
+    Args:
+        error_bars: 各時間帯の平均ERに95%誤差範囲を表示する（抽出した標本での分析用）
+    """
     if df.empty or "hour" not in df.columns or "er_percentage" not in df.columns:
         return None
 
     # 時間帯別の平均ERを計算
-    hourly_data = df.groupby("hour")["er_percentage"].mean().round(2).reset_index()
+    grouped = df.groupby("hour")["er_percentage"]
+    hourly_data = grouped.mean().round(2).reset_index()
+    hourly_data["error"] = _mean_error(grouped).to_numpy()
     hourly_data = hourly_data.sort_values("hour")
     hourly_data["時間"] = hourly_data["hour"].astype(str) + "時"
     hourly_data["text_label"] = hourly_data["er_percentage"].apply(lambda x: f"{x:.1f}%")
@@ -27,6 +39,7 @@ def create_hourly_chart(df):
         text="text_label",
         color="er_percentage",
         color_continuous_scale="Viridis",
+        error_y="error" if error_bars else None,
     )
 
     # テキストとカラーマップの設定
@@ -40,7 +53,7 @@ def create_hourly_chart(df):
     )
 
     # Y軸の範囲をデータに合わせて設定（0から開始）
-    y_max = hourly_data["er_percentage"].max()
+    y_max = (hourly_data["er_percentage"] + (hourly_data["error"] if error_bars else 0)).max()
     y_min = hourly_data["er_percentage"].min()
     # データの変動を正しく表示するため、Y軸の範囲を調整
     y_range = [0, y_max * 1.1]
@@ -72,14 +85,21 @@ def create_hourly_chart(df):
     return json.dumps(fig, cls=PlotlyJSONEncoder)
 
 
-def create_weekly_chart(df):
-    """曜日別ERチャートを作成"""
+def create_weekly_chart(df, error_bars=False):
+    """
+    曜日別ERチャートを作成
+
+    Args:
+        error_bars: 各曜日の平均ERに95%誤差範囲を表示する（抽出した標本での分析用）
+    """
     if df.empty or "weekday" not in df.columns or "er_percentage" not in df.columns:
         return None
 
     # 曜日別の平均ERを計算
     weekday_order = ["Monday", "Tuesday", "Wednesday", "Thursday", "Friday", "Saturday", "Sunday"]
-    weekday_data = df.groupby("weekday")["er_percentage"].mean().round(2).reset_index()
+    grouped = df.groupby("weekday")["er_percentage"]
+    weekday_data = grouped.mean().round(2).reset_index()
+    weekday_data["error"] = _mean_error(grouped).to_numpy()
 
     # 曜日順にソート
     weekday_data["weekday"] = pd.Categorical(weekday_data["weekday"], categories=weekday_order, ordered=True)
@@ -111,6 +131,7 @@ def create_weekly_chart(df):
                 text=weekday_data["text_label"],
                 textposition="outside",
                 orientation="v",  # 明示的に縦向きを指定
+                error_y=dict(type="data", array=weekday_data["error"]) if error_bars else None,
                 marker=dict(
                     color=weekday_data["er_percentage"],
                     colorscale="Plasma",
@@ -124,7 +145,7 @@ def create_weekly_chart(df):
     # レイアウトを設定
 
     # Y軸の範囲をデータに合わせて設定（0から開始）
-    y_max = weekday_data["er_percentage"].max()
+    y_max = (weekday_data["er_percentage"] + (weekday_data["error"] if error_bars else 0)).max()
     y_min = weekday_data["er_percentage"].min()
     # データの変動を正しく表示するため、Y軸の範囲を調整
     y_range = [0, y_max * 1.1]
@@ -233,3 +254,44 @@ def create_hashtag_chart(df, top_n=10):
     )
 
     return json.dumps(fig, cls=PlotlyJSONEncoder)
+
+
+def create_account_comparison_chart(comparison):
+    """アカウント別の平均ER・最高ER比較チャートを作成"""
+    if not comparison:
+        return None
+
+    accounts = [str(item["account_id"]) for item in comparison]
+
+    fig = go.Figure(
+        data=[
+            go.Bar(
+                name="平均ER",
+                x=accounts,
+                y=[item["avg_er"] for item in comparison],
+                text=[f"{item['avg_er']:.1f}%" for item in comparison],
+                textposition="outside",
+                marker=dict(color="#0d6efd"),
+            ),
+            go.Bar(
+                name="最高ER",
+                x=accounts,
+                y=[item["max_er"] for item in comparison],
+                marker=dict(color="#20c997"),
+            ),
+        ]
+    )
+
+    fig.update_layout(
+        title="アカウント別エンゲージメント率の比較",
+        xaxis_title="アカウント",
+        yaxis_title="エンゲージメント率（%）",
+        template="plotly_white",
+        height=500,
+        barmode="group",
+        margin=dict(l=60, r=60, t=60, b=60),
+        xaxis=dict(type="category"),
+        yaxis=dict(showgrid=True, gridcolor="lightgray", rangemode="tozero"),
+    )
+
+    return json.dumps(fig, cls=PlotlyJSONEncoder)
@@ -0,0 +1,84 @@
+import json
+import os
+import pickle
+import shutil
+import tempfile
+
+import numpy as np
+
+from utils.columnar import split_frame, assemble_frame
+
+COLUMN_DIR = ".columns"
+META_NAME = "meta.json"
+OBJECTS_NAME = "objects.pkl"
+
+
+def column_dir(upload_folder, key):
+    """データセットの列ファイルを保存するディレクトリ"""
+    return os.path.join(upload_folder, COLUMN_DIR, key)
+
+
+def save_columns(upload_folder, key, df):
+    """
+    データセットを列ごとのファイルとして保存する
+
+    数値列（likes・reach・er_percentage・hour など）や日時列は、前処理後の
+    dtypeのまま1列1ファイルの .npy 形式で保存し、読み込み時にmmapできるようにする。
+    文字列などの可変長の列はまとめてpickleで保存する。
+
+    Args:
+        upload_folder: アップロードディレクトリ
+        key: データセットのハッシュ
+        df: 前処理済みのDataFrame
+    """
+    arrays, objects, columns = split_frame(df)
+    target = column_dir(upload_folder, key)
+    parent = os.path.dirname(target)
+    os.makedirs(parent, exist_ok=True)
+
+    # 一時ディレクトリに書き出してから置き換え、書き込み途中の状態を読まれないようにする
+    tmp_dir = tempfile.mkdtemp(dir=parent, prefix=".tmp-")
+    try:
+        files = {}
+        for i, (col, values) in enumerate(arrays.items()):
+            files[col] = f"{i}.npy"
+            np.save(os.path.join(tmp_dir, files[col]), values, allow_pickle=False)
+
+        with open(os.path.join(tmp_dir, OBJECTS_NAME), "wb") as f:
+            pickle.dump(objects, f, protocol=pickle.HIGHEST_PROTOCOL)
+
+        with open(os.path.join(tmp_dir, META_NAME), "w", encoding="utf-8") as f:
+            json.dump({"columns": columns, "arrays": files}, f, ensure_ascii=False)
+
+        if os.path.isdir(target):
+            shutil.rmtree(target)
+        os.replace(tmp_dir, target)
+    except BaseException:
+        shutil.rmtree(tmp_dir, ignore_errors=True)
+        raise
+
+
+def load_columns(upload_folder, key):
+    """
+    列ごとのファイルからデータセットを読み込む
+
+    固定長の列は読み取り専用でmmapするだけなので、実際に参照された列の
+    ページだけがOSのページキャッシュから読み込まれる。
+
+    Returns:
+        pd.DataFrame or None: 保存されていない場合はNone
+    """
+    directory = column_dir(upload_folder, key)
+    try:
+        with open(os.path.join(directory, META_NAME), "r", encoding="utf-8") as f:
+            meta = json.load(f)
+        with open(os.path.join(directory, OBJECTS_NAME), "rb") as f:
+            objects = pickle.load(f)
+        arrays = {
+            col: np.load(os.path.join(directory, name), mmap_mode="r", allow_pickle=False)
+            for col, name in meta["arrays"].items()
+        }
+    except (OSError, ValueError, EOFError, pickle.UnpicklingError):
+        return None
+
+    return assemble_frame(arrays, objects, meta["columns"])
@@ -0,0 +1,42 @@
+import numpy as np
+import pandas as pd
+
+
+def is_fixed_width(series):
+    """固定長の配列としてそのまま共有できる列か判定（数値・真偽値・タイムゾーンなし日時）"""
+    dtype = series.dtype
+    return isinstance(dtype, np.dtype) and dtype.kind in "biufM"
+
+
+def split_frame(df):
+    """
+    DataFrameを固定長の配列列とそれ以外の列に分割する
+
+    Args:
+        df: 分割するDataFrame
+
+    Returns:
+        tuple: (列名 -> np.ndarray, 列名 -> list, 元の列順)
+    """
+    arrays = {}
+    objects = {}
+    for col in df.columns:
+        series = df[col]
+        if is_fixed_width(series):
+            arrays[col] = np.ascontiguousarray(series.to_numpy())
+        else:
+            objects[col] = series.tolist()
+    return arrays, objects, list(df.columns)
+
+
+def assemble_frame(arrays, objects, columns):
+    """
+    split_frame で分割した列からDataFrameを組み立てる
+
+    固定長の配列はコピーせずにそのまま列として使う（共有メモリやmmap上の
+    配列であれば、DataFrameはその領域を直接参照する）。
+    """
+    data = {}
+    for col in columns:
+        data[col] = arrays[col] if col in arrays else objects[col]
+    return pd.DataFrame(data, columns=columns, copy=False)
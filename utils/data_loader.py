@@ -3,78 +3,114 @@ import numpy as np
 from datetime import datetime
 import os
 
+from utils.engagement import engagement_rate
 
-def load_csv(file_path):
+
+def load_csv(file_path, sample_size=None, seed=0):
     """
     CSVファイルを読み込んで前処理を行う
 
     Args:
         file_path: CSVファイルのパス
+        sample_size: 指定した場合はファイル全体を読まず、ランダムな位置から読み込んだ行を
+            曜日 × 時間 × フォロワー数で層化抽出した sample_size 行だけを返す
+            （抽出の情報と推定値は df.attrs["sample"]、sampling.sample_csv を参照）
+        seed: 層化抽出の乱数シード
 
     Returns:
         pd.DataFrame: 前処理済みのDataFrame
+
+    Raises:
+        QuotedNewlineError: sample_size を指定し、引用符で囲まれた改行を含むため抽出できない場合
     """
+    from utils.sampling import QuotedNewlineError
+
     try:
+        if sample_size is not None:
+            from utils.sampling import sample_csv
+
+            return sample_csv(file_path, sample_size, preprocess, seed=seed)
+
         # CSVファイルを読み込み
         df = pd.read_csv(file_path)
+        return preprocess(df)
 
-        # 必要な列を確認
-        required_columns = [
-            "post_id",
-            "posted_at",
-            "followers_at_post",
-            "reach",
-            "impressions",
-            "likes",
-            "comments",
-            "saves",
-            "engagement_total",
-            "hashtags",
-        ]
-
-        # 列名を統一
-        if "post_id" not in df.columns and "id" in df.columns:
-            df = df.rename(columns={"id": "post_id"})
-        if "engagement_total" not in df.columns and "engagement" in df.columns:
-            df = df = df.rename(columns={"engagement": "engagement_total"})
-
-        # 必要な列のみを選択
-        available_columns = [col for col in required_columns if col in df.columns]
-        df = df[available_columns]
-
-        # 日時列の処理
-        if "posted_at" in df.columns:
-            df["posted_at"] = pd.to_datetime(df["posted_at"], errors="coerce")
-            df["hour"] = df["posted_at"].dt.hour
-            df["weekday"] = df["posted_at"].dt.day_name()
-
-        # 数値列の処理
-        numeric_columns = ["followers_at_post", "reach", "impressions", "likes", "comments", "saves"]
-        for col in numeric_columns:
-            if col in df.columns:
-                df[col] = df[col].replace(["", "nan", "NaN", "null", "NULL"], np.nan)
-                df[col] = pd.to_numeric(df[col], errors="coerce")
-
-        # engagement_totalを計算（likes + comments + saves）
-        if all(col in df.columns for col in ["likes", "comments", "saves"]):
-            df["engagement_total"] = df["likes"] + df["comments"] + df["saves"]
-
-        # エンゲージメント率を計算
-        if "followers_at_post" in df.columns and "engagement_total" in df.columns:
-            # フォロワー数ベースでエンゲージメント率を計算
-            df["er_percentage"] = (df["engagement_total"] / df["followers_at_post"] * 100).round(2)
-            df.loc[df["followers_at_post"] == 0, "er_percentage"] = np.nan
-
-        # ハッシュタグ列の処理
-        if "hashtags" in df.columns:
-            df["hashtags"] = df["hashtags"].fillna("").astype(str)
-
-        return df
-
+    except QuotedNewlineError:
+        # 呼び出し元がファイル全体の読み込みに切り替えられるよう、そのまま送出する
+        raise
     except Exception as e:
         raise Exception(f"CSVファイルの読み込みエラー: {str(e)}")
 
 
+def preprocess(df):
+    """
+    読み込んだCSVのDataFrameに前処理を行う
+
+    Args:
+        df: CSVをそのまま読み込んだDataFrame
+
+    Returns:
+        pd.DataFrame: 前処理済みのDataFrame
+    """
+    # 必要な列を確認
+    required_columns = [
+        "post_id",
+        "posted_at",
+        "followers_at_post",
+        "reach",
+        "impressions",
+        "likes",
+        "comments",
+        "saves",
+        "engagement_total",
+        "hashtags",
+        "account_id",
+    ]
+
+    # 列名を統一
+    if "post_id" not in df.columns and "id" in df.columns:
+        df = df.rename(columns={"id": "post_id"})
+    if "engagement_total" not in df.columns and "engagement" in df.columns:
+        df = df = df.rename(columns={"engagement": "engagement_total"})
+
+    # 必要な列のみを選択
+    available_columns = [col for col in required_columns if col in df.columns]
+    df = df[available_columns]
+
+    # アカウントIDは数値・文字列どちらで書かれていても同じキーになるよう文字列に統一
+    if "account_id" in df.columns:
+        account = df["account_id"]
+        df["account_id"] = account.where(account.isna(), account.astype(str).str.strip())
+
+    # 日時列の処理
+    if "posted_at" in df.columns:
+        df["posted_at"] = pd.to_datetime(df["posted_at"], errors="coerce")
+        df["hour"] = df["posted_at"].dt.hour
+        df["weekday"] = df["posted_at"].dt.day_name()
+
+    # 数値列の処理
+    numeric_columns = ["followers_at_post", "reach", "impressions", "likes", "comments", "saves"]
+    for col in numeric_columns:
+        if col in df.columns:
+            df[col] = df[col].replace(["", "nan", "NaN", "null", "NULL"], np.nan)
+            df[col] = pd.to_numeric(df[col], errors="coerce")
+
+    # engagement_totalを計算（likes + comments + saves）
+    if all(col in df.columns for col in ["likes", "comments", "saves"]):
+        df["engagement_total"] = df["likes"] + df["comments"] + df["saves"]
+
+    # エンゲージメント率を計算
+    if "followers_at_post" in df.columns and "engagement_total" in df.columns:
+        # フォロワー数ベースでエンゲージメント率を計算（フォロワー数が0以下の投稿はNaN）
+        df["er_percentage"] = engagement_rate(df["engagement_total"], df["followers_at_post"])
+
+    # ハッシュタグ列の処理
+    if "hashtags" in df.columns:
+        df["hashtags"] = df["hashtags"].fillna("").astype(str)
+
+    return df
+
+
 def get_sample_data():
     """サンプルデータを取得"""
     sample_path = os.path.join(
@@ -0,0 +1,119 @@
+import fcntl
+import json
+import os
+import tempfile
+from contextlib import contextmanager
+
+OBJECTS_DIR = ".objects"
+CATALOG_NAME = ".catalog.json"
+
+
+class DatasetCatalog:
+    """
+    アップロードされたデータセットを内容ハッシュで保存し、ファイル名と対応付ける
+
+    CSVは UPLOAD_FOLDER/.objects/<内容ハッシュ>.csv に一度だけ保存し、
+    ファイル名 -> 内容ハッシュの対応を UPLOAD_FOLDER/.catalog.json に記録する。
+    同じ内容を別名でアップロードした場合は既存のファイルを共有し、
+    同じ名前で別の内容をアップロードした場合は別名で登録する。
+    """
+
+    def __init__(self, upload_folder):
+        self.upload_folder = upload_folder
+        self.objects_dir = os.path.join(upload_folder, OBJECTS_DIR)
+        self.catalog_path = os.path.join(upload_folder, CATALOG_NAME)
+
+    def object_path(self, key):
+        """内容ハッシュに対応するCSVのパス"""
+        return os.path.join(self.objects_dir, f"{key}.csv")
+
+    @contextmanager
+    def _lock(self):
+        """カタログ更新時の排他ロック（複数ワーカープロセス共通）"""
+        os.makedirs(self.upload_folder, exist_ok=True)
+        with open(os.path.join(self.upload_folder, ".catalog.lock"), "a") as f:
+            fcntl.flock(f, fcntl.LOCK_EX)
+            try:
+                yield
+            finally:
+                fcntl.flock(f, fcntl.LOCK_UN)
+
+    def names(self):
+        """登録済みのファイル名 -> 内容ハッシュの辞書"""
+        try:
+            with open(self.catalog_path, "r", encoding="utf-8") as f:
+                return json.load(f)["names"]
+        except (OSError, ValueError, KeyError):
+            return {}
+
+    def _write(self, names):
+        fd, tmp_path = tempfile.mkstemp(dir=self.upload_folder, prefix=".catalog-", suffix=".json")
+        try:
+            with os.fdopen(fd, "w", encoding="utf-8") as f:
+                json.dump({"names": names}, f, ensure_ascii=False, indent=2)
+            os.replace(tmp_path, self.catalog_path)
+        except BaseException:
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
+            raise
+
+    def resolve(self, name):
+        """
+        ファイル名から内容ハッシュを取得
+
+        Returns:
+            str or None: 登録されていない場合はNone
+        """
+        return self.names().get(name)
+
+    def add(self, name, key, tmp_path):
+        """
+        受信済みのCSVを内容ハッシュで保存し、ファイル名を登録する
+
+        Args:
+            name: 希望するファイル名
+            key: CSVの内容ハッシュ
+            tmp_path: 受信したCSVの一時ファイル（保存済みの内容であれば削除する）
+
+        Returns:
+            tuple: (登録したファイル名, 同じ内容で登録済みだったファイル名またはNone)
+        """
+        with self._lock():
+            os.makedirs(self.objects_dir, exist_ok=True)
+            target = self.object_path(key)
+            if os.path.exists(target):
+                os.remove(tmp_path)
+            else:
+                os.replace(tmp_path, target)
+
+            names = self.names()
+            existing = next((registered for registered, value in names.items() if value == key), None)
+            if names.get(name) == key:
+                return name, existing
+
+            # 同じ名前で別の内容が登録済み（または以前の形式で保存済み）の場合は連番を付けて別名にする
+            registered = name
+            stem, ext = os.path.splitext(name)
+            number = 2
+            while registered in names or os.path.exists(os.path.join(self.upload_folder, registered)):
+                registered = f"{stem}-{number}{ext}"
+                number += 1
+
+            names[registered] = key
+            self._write(names)
+            return registered, existing
+
+    def remove(self, name):
+        """
+        ファイル名の登録を取り消す（他の名前から参照されていないCSVも削除する）
+
+        前処理に失敗したアップロードを登録前の状態に戻すために使う。
+        """
+        with self._lock():
+            names = self.names()
+            key = names.pop(name, None)
+            if key is None:
+                return
+            self._write(names)
+            if key not in names.values() and os.path.exists(self.object_path(key)):
+                os.remove(self.object_path(key))
@@ -0,0 +1,132 @@
+import warnings
+
+import numpy as np
+
+# エンゲージメント数を構成する列
+COMPONENTS = ["likes", "comments", "saves"]
+COMPONENT_LABELS = {"likes": "いいね", "comments": "コメント", "saves": "保存"}
+
+# ERの分母に使える列
+DENOMINATOR_LABELS = {
+    "followers_at_post": "フォロワー数",
+    "reach": "リーチ数",
+    "impressions": "インプレッション数",
+}
+
+DEFAULT_WEIGHTS = {"likes": 1, "comments": 1, "saves": 1}
+
+# 標準のER定義（表示名 -> 定義）
+ER_DEFINITIONS = {
+    "フォロワー数ベース": {
+        "weights": DEFAULT_WEIGHTS,
+        "denominator": "followers_at_post",
+        "formula": "（いいね＋コメント＋保存）÷ フォロワー数 × 100",
+    },
+    "リーチ数ベース": {
+        "weights": DEFAULT_WEIGHTS,
+        "denominator": "reach",
+        "formula": "エンゲージメント数 ÷ リーチ数 × 100",
+    },
+    "インプレッション数ベース": {
+        "weights": DEFAULT_WEIGHTS,
+        "denominator": "impressions",
+        "formula": "（いいね＋コメント＋保存）÷ インプレッション数 × 100",
+    },
+}
+
+
+def engagement_rate(numerator, denominator):
+    """
+    ER（%）を計算する
+
+    分母が0以下または欠損の投稿はNaNとし、小数第2位で丸める。
+    すべてのER定義と前処理の er_percentage で同じ扱いにする。
+    """
+    numerator = np.asarray(numerator, dtype=float)
+    denominator = np.asarray(denominator, dtype=float)
+    with np.errstate(divide="ignore", invalid="ignore"):
+        rates = np.where(denominator > 0, numerator / denominator * 100, np.nan)
+    return np.round(rates, 2)
+
+
+def _formula(weights, denominator):
+    """重みと分母から計算式の表示を作成"""
+    terms = [
+        COMPONENT_LABELS[col] if weights[col] == 1 else f"{COMPONENT_LABELS[col]}×{weights[col]:g}"
+        for col in COMPONENTS
+        if weights.get(col)
+    ]
+    return f"（{'＋'.join(terms)}）÷ {DENOMINATOR_LABELS[denominator]} × 100"
+
+
+def resolve_definitions(columns, custom_definitions=None):
+    """
+    データセットの列で計算できるER定義を返す
+
+    Args:
+        columns: データセットの列名
+        custom_definitions: 追加のER定義（表示名 -> {"weights": {列: 重み}, "denominator": 列,
+            "formula": 表示用の計算式（省略可）}）
+
+    Returns:
+        list: (表示名, 重みの辞書, 分母の列, 計算式) のリスト
+
+    Raises:
+        ValueError: 追加のER定義に不明な列が指定されている場合
+    """
+    definitions = []
+    for name, definition in {**ER_DEFINITIONS, **(custom_definitions or {})}.items():
+        weights = definition.get("weights", DEFAULT_WEIGHTS)
+        denominator = definition.get("denominator", "followers_at_post")
+        unknown = [col for col in weights if col not in COMPONENTS]
+        if unknown or denominator not in DENOMINATOR_LABELS:
+            raise ValueError(f"ER定義「{name}」に不明な列があります: {', '.join(unknown) or denominator}")
+        if denominator in columns:
+            definitions.append((name, weights, denominator, definition.get("formula") or _formula(weights, denominator)))
+    return definitions
+
+
+def compute_rates(df, definitions):
+    """
+    全てのER定義の投稿ごとのERを1回のNumPy演算でまとめて計算する
+
+    エンゲージメント数の構成列を (構成列数, 投稿数) の配列に、各定義の重みを
+    (定義数, 構成列数) の行列にまとめ、行列積で全定義の分子を求めてから
+    分母の配列でまとめて割る。
+
+    Returns:
+        np.ndarray: (定義数, 投稿数) のER配列
+    """
+    n = len(df)
+    components = np.vstack(
+        [df[col].to_numpy(dtype=float, na_value=np.nan) if col in df.columns else np.full(n, np.nan) for col in COMPONENTS]
+    )
+    weights = np.array([[weights.get(col, 0) for col in COMPONENTS] for _, weights, _, _ in definitions], dtype=float)
+    # 重み0の構成列は欠損していても分子に影響させない
+    used = weights != 0
+    numerators = np.einsum("kc,cn->kn", weights, np.nan_to_num(components))
+    missing = (np.isnan(components)[None, :, :] & used[:, :, None]).any(axis=1)
+    numerators[missing] = np.nan
+
+    denominators = np.vstack([df[denominator].to_numpy(dtype=float, na_value=np.nan) for _, _, denominator, _ in definitions])
+    return engagement_rate(numerators, denominators)
+
+
+def summarize_rates(rates):
+    """
+    ER配列の定義ごとの統計を計算する（NaNは除外）
+
+    Returns:
+        dict: "count"・"mean"・"max"・"min"・"median" -> 定義ごとの値の配列
+    """
+    counts = (~np.isnan(rates)).sum(axis=1)
+    with warnings.catch_warnings():
+        # 有効な投稿がない定義は統計がNaNになる（count で判定する）
+        warnings.simplefilter("ignore", RuntimeWarning)
+        return {
+            "count": counts,
+            "mean": np.nanmean(rates, axis=1),
+            "max": np.nanmax(rates, axis=1),
+            "min": np.nanmin(rates, axis=1),
+            "median": np.nanmedian(rates, axis=1),
+        }
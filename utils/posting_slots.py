@@ -0,0 +1,139 @@
+import numpy as np
+import pandas as pd
+
+from utils.accounts import WEEKDAY_JP, WEEKDAY_ORDER
+
+# 1週間の投稿枠（曜日 × 時間）
+SLOTS_PER_WEEK = 7 * 24
+# 平滑化カーネル（ガウス）の標準偏差（時間）
+SLOT_BANDWIDTH = 1.5
+# 予想ERを出す枠の下限（カーネルで重み付けした周辺の投稿数）
+SLOT_MIN_WEIGHT = 2.0
+# 返す投稿枠の数
+SLOT_TOP_N = 5
+
+
+def slot_kernel(bandwidth=SLOT_BANDWIDTH):
+    """
+    168枠の循環ガウスカーネル
+
+    日曜23時の次は月曜0時として、週をまたいで隣接する枠を平滑化する。
+    中心の重みを1にするため、投稿1件の枠の平滑化後の重みは1以上になる。
+    """
+    offsets = np.arange(SLOTS_PER_WEEK)
+    distance = np.minimum(offsets, SLOTS_PER_WEEK - offsets)
+    return np.exp(-0.5 * (distance / bandwidth) ** 2)
+
+
+def slot_totals(df, by=None):
+    """
+    投稿枠ごとのERの合計と投稿数を集計する
+
+    Args:
+        df: weekday・hour・er_percentage 列を含む前処理済みのDataFrame
+        by: グループ分けする列（アカウント列など、省略時は全体で1グループ）
+
+    Returns:
+        tuple: (グループのリスト, ERの合計 (グループ数, 168), 投稿数 (グループ数, 168))
+    """
+    columns = ["weekday", "hour", "er_percentage"] + ([by] if by else [])
+    if df.empty or not all(col in df.columns for col in columns):
+        return [], np.zeros((0, SLOTS_PER_WEEK)), np.zeros((0, SLOTS_PER_WEEK))
+
+    valid = df[columns].copy()
+    valid["weekday"] = valid["weekday"].map({name: i for i, name in enumerate(WEEKDAY_ORDER)})
+    valid = valid.dropna()
+    if by:
+        codes, groups = pd.factorize(valid[by], sort=True)
+        groups = groups.tolist()
+    else:
+        codes, groups = np.zeros(len(valid), dtype=np.int64), [None]
+
+    slots = valid["weekday"].to_numpy(dtype=np.int64) * 24 + valid["hour"].to_numpy(dtype=np.int64)
+    flat = codes * SLOTS_PER_WEEK + slots
+    size = len(groups) * SLOTS_PER_WEEK
+    sums = np.bincount(flat, weights=valid["er_percentage"].to_numpy(dtype=float), minlength=size)
+    counts = np.bincount(flat, minlength=size).astype(float)
+    return groups, sums.reshape(-1, SLOTS_PER_WEEK), counts.reshape(-1, SLOTS_PER_WEEK)
+
+
+def smooth_slots(sums, counts, bandwidth=SLOT_BANDWIDTH, min_weight=SLOT_MIN_WEIGHT):
+    """
+    投稿数で重み付けして168枠のERを平滑化する
+
+    ERの合計と投稿数をそれぞれカーネルと循環畳み込みし、その比を予想ERとする
+    （投稿の多い枠ほど強く効く）。全グループの合計と投稿数を1つの配列に積み、
+    1回のFFTでまとめて畳み込む。
+
+    Args:
+        sums: ERの合計 (グループ数, 168)
+        counts: 投稿数 (グループ数, 168)
+
+    Returns:
+        tuple: (予想ER (グループ数, 168), 平滑化後の重み (グループ数, 168))
+            周辺の投稿が min_weight 未満の枠の予想ERはNaN
+    """
+    groups = len(sums)
+    stacked = np.concatenate([sums, counts])
+    spectrum = np.fft.rfft(slot_kernel(bandwidth))
+    smoothed = np.fft.irfft(np.fft.rfft(stacked, axis=1) * spectrum, n=SLOTS_PER_WEEK, axis=1)
+    smoothed_sums, weights = smoothed[:groups], smoothed[groups:]
+    # FFTの丸め誤差で投稿のない枠がわずかに正負の値になるのを除く
+    weights = np.where(weights > 1e-9, weights, 0.0)
+    with np.errstate(divide="ignore", invalid="ignore"):
+        expected = np.where(weights >= min_weight, smoothed_sums / weights, np.nan)
+    return expected, weights
+
+
+def rank_slots(expected, weights, counts, top_n=SLOT_TOP_N):
+    """
+    1グループの投稿枠を予想ERの高い順に並べる
+
+    Returns:
+        list: 投稿枠の辞書（曜日・時間・予想ER・投稿数・平滑化後の重み）のリスト
+    """
+    candidates = np.flatnonzero(~np.isnan(expected))
+    order = candidates[np.argsort(-expected[candidates], kind="stable")][:top_n]
+    return [
+        {
+            "slot": int(slot),
+            "weekday": WEEKDAY_ORDER[slot // 24],
+            "曜日": WEEKDAY_JP[WEEKDAY_ORDER[slot // 24]],
+            "hour": int(slot % 24),
+            "expected_er": round(float(expected[slot]), 2),
+            "posts": int(counts[slot]),
+            "weight": round(float(weights[slot]), 1),
+        }
+        for slot in order
+    ]
+
+
+def optimize_posting_slots(df, top_n=SLOT_TOP_N):
+    """
+    最適な投稿枠（曜日 × 時間）を予想ERの高い順に返す
+
+    Returns:
+        list: rank_slots の結果（必要な列がない場合は空）
+    """
+    groups, sums, counts = slot_totals(df)
+    if not groups:
+        return []
+    expected, weights = smooth_slots(sums, counts)
+    return rank_slots(expected[0], weights[0], counts[0], top_n=top_n)
+
+
+def optimize_posting_slots_by_group(df, by, top_n=SLOT_TOP_N):
+    """
+    グループ（アカウントなど）ごとの最適な投稿枠をまとめて計算する
+
+    全グループを (グループ数, 168) の配列で一度に平滑化するため、
+    グループ数が多くてもFFTは1回で済む。
+
+    Returns:
+        dict: グループ -> rank_slots の結果
+    """
+    groups, sums, counts = slot_totals(df, by=by)
+    if not groups:
+        return {}
+    expected, weights = smooth_slots(sums, counts)
+    return {group: rank_slots(expected[i], weights[i], counts[i], top_n=top_n) for i, group in enumerate(groups)}
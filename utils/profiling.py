@@ -0,0 +1,143 @@
+import cProfile
+import json
+import os
+import re
+import sys
+import threading
+import time
+from collections import Counter
+from datetime import datetime
+
+# プロファイラの種類（sample: スタックのサンプリングのみ、cprofile: cProfileも併用）
+PROFILE_MODES = ("sample", "cprofile")
+# スタックを記録する間隔（秒）
+SAMPLE_INTERVAL = 0.005
+
+
+class StackSampler:
+    """
+    別スレッドから対象スレッドのスタックを一定間隔で記録する
+
+    記録したスタックは flamegraph.pl や speedscope で読める collapsed 形式
+    （呼び出し元から順に ; で連結したスタックと回数）で出力する。
+    """
+
+    def __init__(self, thread_id, interval=SAMPLE_INTERVAL):
+        self.thread_id = thread_id
+        self.interval = interval
+        self.counts = Counter()
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, name="stack-sampler", daemon=True)
+
+    def start(self):
+        self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+        self._thread.join()
+
+    def _run(self):
+        while not self._stop.wait(self.interval):
+            frame = sys._current_frames().get(self.thread_id)
+            stack = []
+            while frame is not None:
+                code = frame.f_code
+                stack.append(f"{os.path.basename(code.co_filename)}:{code.co_qualname}")
+                frame = frame.f_back
+            if stack:
+                self.counts[";".join(reversed(stack))] += 1
+
+    def collapsed(self):
+        """collapsed 形式のテキスト"""
+        return "".join(f"{stack} {count}\n" for stack, count in self.counts.most_common())
+
+
+class RequestProfiler:
+    """
+    1リクエストをプロファイルし、結果をタグ付きで保存する
+
+    ストリーミングのレスポンスも送信完了まで計測できるよう、start() と stop() は
+    リクエストを処理するスレッドで呼ぶ（cProfile は呼び出したスレッドだけを計測する）。
+    データセットの内容ハッシュ・行数は処理中に tags へ記録する。
+
+    Args:
+        mode: PROFILE_MODES のいずれか
+        tags: 保存する情報（ルート・メソッドなど）
+    """
+
+    def __init__(self, mode, tags, interval=SAMPLE_INTERVAL):
+        self.mode = mode
+        self.tags = dict(tags)
+        endpoint = re.sub(r"[^A-Za-z0-9_-]", "_", self.tags.get("endpoint") or "unknown")
+        dataset = (self.tags.get("dataset_hash") or "nodata")[:12]
+        self.id = f"{datetime.now().strftime('%Y%m%d-%H%M%S-%f')}-{endpoint}-{dataset}"
+        self.sampler = StackSampler(threading.get_ident(), interval)
+        self.profile = cProfile.Profile() if mode == "cprofile" else None
+        self._started = None
+        self.duration = None
+
+    def start(self):
+        self._started = time.perf_counter()
+        self.sampler.start()
+        if self.profile is not None:
+            self.profile.enable()
+
+    def stop(self):
+        """計測を終了する（終了済みの場合は何もしない）"""
+        if self.duration is not None:
+            return
+        if self.profile is not None:
+            self.profile.disable()
+        self.sampler.stop()
+        self.duration = time.perf_counter() - self._started
+
+    def save(self, folder):
+        """
+        プロファイルを保存する
+
+        <ID>.collapsed（スタックのサンプル）、<ID>.pstats（cprofile の場合）と
+        タグ・計測時間を記録した <ID>.json を書き込む。
+
+        Returns:
+            str: プロファイルのID
+        """
+        os.makedirs(folder, exist_ok=True)
+        profile_id = self.id
+        files = {"collapsed": f"{profile_id}.collapsed"}
+        with open(os.path.join(folder, files["collapsed"]), "w", encoding="utf-8") as f:
+            f.write(self.sampler.collapsed())
+        if self.profile is not None:
+            files["pstats"] = f"{profile_id}.pstats"
+            self.profile.dump_stats(os.path.join(folder, files["pstats"]))
+
+        meta = {
+            "id": profile_id,
+            "mode": self.mode,
+            **self.tags,
+            "duration_ms": round(self.duration * 1000, 1),
+            "samples": sum(self.sampler.counts.values()),
+            "sample_interval_ms": self.sampler.interval * 1000,
+            "files": files,
+            "created_at": datetime.now().isoformat(timespec="seconds"),
+        }
+        # JSON（メタ情報）を最後に書き込み、保存完了の目印にする
+        with open(os.path.join(folder, f"{profile_id}.json"), "w", encoding="utf-8") as f:
+            json.dump(meta, f, ensure_ascii=False, indent=2)
+        return profile_id
+
+
+def list_profiles(folder):
+    """保存済みプロファイルのメタ情報（新しい順）"""
+    try:
+        names = sorted((name for name in os.listdir(folder) if name.endswith(".json")), reverse=True)
+    except OSError:
+        return []
+
+    profiles = []
+    for name in names:
+        try:
+            with open(os.path.join(folder, name), "r", encoding="utf-8") as f:
+                profiles.append(json.load(f))
+        except (OSError, ValueError):
+            continue
+    return profiles
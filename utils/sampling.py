@@ -0,0 +1,218 @@
+import io
+import math
+import os
+
+import numpy as np
+import pandas as pd
+
+# ランダムな位置から読み込むブロックの大きさ（バイト）
+SAMPLE_BLOCK_BYTES = 64 * 1024
+# 層化抽出の元にする行数（サンプル行数に対する倍率）
+SAMPLE_POOL_FACTOR = 4
+# フォロワー数の階層数（分位点で区切る）
+FOLLOWER_BANDS = 3
+# 誤差範囲の信頼係数（95%）
+CONFIDENCE_Z = 1.96
+
+# 推定する統計量（calculate_summary_stats のキー -> 列）
+ESTIMATED_STATS = {
+    "avg_er": "er_percentage",
+    "avg_likes": "likes",
+    "avg_comments": "comments",
+    "avg_saves": "saves",
+    "avg_engagement": "engagement_total",
+}
+
+WEEKDAY_INDEX = {
+    name: i for i, name in enumerate(["Monday", "Tuesday", "Wednesday", "Thursday", "Friday", "Saturday", "Sunday"])
+}
+
+
+class QuotedNewlineError(ValueError):
+    """引用符で囲まれた改行（複数行のキャプションなど）を含み、行単位で抽出できないCSV"""
+
+
+def _has_open_quote(line):
+    """行の引用符が閉じていない（引用符で囲まれた改行をまたいでいる）か"""
+    return line.count(b'"') % 2 == 1
+
+
+def read_random_blocks(file_path, target_rows, block_size=SAMPLE_BLOCK_BYTES, seed=0):
+    """
+    CSVのランダムな位置のブロックだけを読み込み、行を集める
+
+    ファイルをブロックに区切り、重複なくランダムに選んだブロックについて、
+    ブロック内で始まる行をすべて読み込む（行の途中から始まる部分は前のブロックに属する）。
+    どの行も選ばれる確率が等しいため、ファイル全体を読まずに一様な標本が得られる。
+    改行で区切ったブロックではレコードの境界が分からないため、先頭ブロックまたは
+    読み込んだ行に引用符で囲まれた改行があれば QuotedNewlineError を送出する。
+
+    Returns:
+        tuple: (ヘッダー行, 行のリスト, 推定総行数, 読み込んだバイト数)
+
+    Raises:
+        QuotedNewlineError: 引用符で囲まれた改行を含む場合
+    """
+    file_size = os.path.getsize(file_path)
+    rng = np.random.default_rng(seed)
+
+    with open(file_path, "rb") as f:
+        header = f.readline()
+        data_start = f.tell()
+
+        # 先頭ブロックの行の長さから、必要なブロック数を見積もる
+        probe = f.read(block_size)
+        if any(_has_open_quote(line) for line in probe[: probe.rfind(b"\n") + 1].splitlines()):
+            raise QuotedNewlineError("引用符で囲まれた改行を含むため標本を抽出できません")
+        line_bytes = max(len(probe) / max(probe.count(b"\n"), 1), 1)
+        block_count = max(math.ceil((file_size - data_start) / block_size), 1)
+        needed = min(math.ceil(target_rows * line_bytes / block_size), block_count)
+
+        lines = []
+        bytes_read = len(header)
+        for block in np.sort(rng.choice(block_count, size=needed, replace=False)):
+            start = data_start + int(block) * block_size
+            end = start + block_size
+            f.seek(start - 1)
+            # 直前の行の残り（前のブロックに属する部分）を読み飛ばす
+            f.readline()
+            while f.tell() < end:
+                line = f.readline()
+                if not line:
+                    break
+                if _has_open_quote(line):
+                    raise QuotedNewlineError("引用符で囲まれた改行を含むため標本を抽出できません")
+                if line.strip():
+                    lines.append(line if line.endswith(b"\n") else line + b"\n")
+            bytes_read += f.tell() - start
+
+    # 読み込んだブロックの割合から総行数を推定（Horvitz-Thompson推定）
+    estimated_rows = round(len(lines) * block_count / needed)
+    return header, lines, estimated_rows, bytes_read
+
+
+def assign_strata(df, bands=FOLLOWER_BANDS):
+    """
+    投稿を曜日 × 時間 × フォロワー数の階層に割り当てる
+
+    欠損している値はそれぞれ1つの階層にまとめる。
+
+    Returns:
+        np.ndarray: 階層番号
+    """
+    n = len(df)
+    weekday = df["weekday"].map(WEEKDAY_INDEX).fillna(7) if "weekday" in df.columns else pd.Series(7, index=df.index)
+    hour = df["hour"].fillna(24) if "hour" in df.columns else pd.Series(24, index=df.index)
+    band = np.full(n, bands)
+    if "followers_at_post" in df.columns:
+        followers = df["followers_at_post"].to_numpy(dtype=float)
+        valid = ~np.isnan(followers)
+        if valid.any():
+            edges = np.quantile(followers[valid], np.linspace(0, 1, bands + 1)[1:-1])
+            band[valid] = np.searchsorted(edges, followers[valid], side="right")
+    return (weekday.to_numpy(dtype=np.int64) * 25 + hour.to_numpy(dtype=np.int64)) * (bands + 1) + band
+
+
+def stratified_sample(strata, sample_size, seed=0):
+    """
+    比例配分で層化抽出する
+
+    各階層から元の件数に比例した件数を抜き出す（端数は余りの大きい階層に配分）。
+    比例配分のため、抽出結果はそのまま分析パイプラインに渡しても偏らない。
+
+    Returns:
+        np.ndarray: 抽出した行の位置
+    """
+    n = len(strata)
+    if sample_size >= n:
+        return np.arange(n)
+
+    rng = np.random.default_rng(seed)
+    labels, inverse, counts = np.unique(strata, return_inverse=True, return_counts=True)
+    quotas = counts * sample_size / n
+    allocation = np.floor(quotas).astype(np.int64)
+    remainder = sample_size - allocation.sum()
+    allocation[np.argsort(-(quotas - allocation), kind="stable")[:remainder]] += 1
+
+    # 階層ごとにランダムな順位を付け、順位が割当件数未満の行を選ぶ
+    order = np.lexsort((rng.random(n), inverse))
+    starts = np.concatenate([[0], np.cumsum(counts)[:-1]])
+    rank = np.empty(n, dtype=np.int64)
+    rank[order] = np.arange(n) - np.repeat(starts, counts)
+    return np.flatnonzero(rank < allocation[inverse])
+
+
+def estimate_stats(pool_strata, sample, sample_strata):
+    """
+    層化抽出した標本から平均値と95%誤差範囲を推定する
+
+    階層の構成比は元の行（第1相）から推定するため、二相抽出の分散
+    （階層内のばらつき＋構成比の推定誤差）で誤差範囲を求める。
+    読み込んだブロック内の行の相関は考慮しない近似値。
+
+    Returns:
+        dict: 統計量名 -> {"estimate": 推定値, "error": 95%誤差範囲の半幅}
+    """
+    labels, pool_counts = np.unique(pool_strata, return_counts=True)
+    pool_size = pool_counts.sum()
+    weights = pool_counts / pool_size
+    positions = np.searchsorted(labels, sample_strata)
+
+    estimates = {}
+    for name, column in ESTIMATED_STATS.items():
+        if column not in sample.columns:
+            continue
+        values = sample[column].to_numpy(dtype=float)
+        valid = ~np.isnan(values)
+        if not valid.any():
+            continue
+        groups = pd.DataFrame({"stratum": positions[valid], "value": values[valid]}).groupby("stratum")["value"]
+        stats = groups.agg(["mean", "var", "count"]).reindex(range(len(labels)))
+        observed = stats["count"].fillna(0).to_numpy() > 0
+        w = weights[observed] / weights[observed].sum()
+        means = stats["mean"].to_numpy()[observed]
+        counts = stats["count"].to_numpy()[observed]
+        # 1件しかない階層の分散は、他の階層の分散をまとめた値で代用する
+        variances = stats["var"].to_numpy()[observed]
+        pooled = np.nanmean(variances) if np.isfinite(variances).any() else 0.0
+        variances = np.where(np.isnan(variances), pooled, variances)
+
+        estimate = float(np.sum(w * means))
+        fraction = np.minimum(counts / (w * pool_size), 1)
+        variance = np.sum(w**2 * variances / counts * (1 - fraction)) + np.sum(w * (means - estimate) ** 2) / pool_size
+        estimates[name] = {"estimate": estimate, "error": float(CONFIDENCE_Z * math.sqrt(max(variance, 0.0)))}
+    return estimates
+
+
+def sample_csv(file_path, sample_size, preprocess, seed=0):
+    """
+    CSVの一部だけを読み込み、層化抽出した標本を前処理済みのDataFrameで返す
+
+    ランダムなブロックから sample_size × SAMPLE_POOL_FACTOR 行程度を読み込み、
+    曜日 × 時間 × フォロワー数の階層で sample_size 行を比例配分で抽出する。
+    抽出の情報と統計量の推定値は df.attrs["sample"] に格納する。
+
+    Args:
+        file_path: CSVファイルのパス
+        sample_size: 抽出する行数
+        preprocess: 読み込んだ行に適用する前処理
+        seed: 乱数シード
+    """
+    header, lines, estimated_rows, bytes_read = read_random_blocks(
+        file_path, sample_size * SAMPLE_POOL_FACTOR, seed=seed
+    )
+    pool = preprocess(pd.read_csv(io.BytesIO(header + b"".join(lines)), on_bad_lines="skip"))
+    pool_strata = assign_strata(pool)
+    positions = stratified_sample(pool_strata, sample_size, seed=seed)
+    df = pool.iloc[positions].reset_index(drop=True)
+
+    df.attrs["sample"] = {
+        "sample_rows": len(df),
+        "pool_rows": len(pool),
+        "estimated_rows": max(estimated_rows, len(pool)),
+        "bytes_read": bytes_read,
+        "file_bytes": os.path.getsize(file_path),
+        "strata": int(len(np.unique(pool_strata))),
+        "estimates": estimate_stats(pool_strata, df, pool_strata[positions]),
+    }
+    return df
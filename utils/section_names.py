@@ -0,0 +1,58 @@
+# セクションの名前と依存関係（pandasを読み込まずに使えるよう、計算関数は sections.py に置く）
+
+# セクション名 -> 依存するセクション
+SECTION_DEPENDENCIES = {
+    "stats": (),
+    "top_rankings": (),
+    "bottom_rankings": (),
+    "hourly": (),
+    "weekly": (),
+    "hashtags": (),
+    "hourly_chart": ("hourly",),
+    "weekly_chart": ("weekly",),
+    "hashtag_chart": ("hashtags",),
+    "engagement": (),
+    "improvement": (),
+    "content_patterns": (),
+    "content": ("content_patterns",),
+    "account_count": (),
+    "accounts": (),
+    "account_comparison": ("accounts",),
+}
+
+# 分析ページのテンプレート変数名 -> セクション名
+TEMPLATE_SECTIONS = {
+    "stats": "stats",
+    "top_rankings": "top_rankings",
+    "bottom_rankings": "bottom_rankings",
+    "hourly_data": "hourly",
+    "weekly_data": "weekly",
+    "hashtag_data": "hashtags",
+    "hourly_chart": "hourly_chart",
+    "weekly_chart": "weekly_chart",
+    "hashtag_chart": "hashtag_chart",
+    "improvement_suggestions": "improvement",
+    "content_recommendations": "content",
+    "engagement_metrics": "engagement",
+    "account_count": "account_count",
+}
+
+
+def parse_sections(value):
+    """
+    カンマ区切りのセクション指定を解析する
+
+    Returns:
+        list: セクション名のリスト（未指定の場合は全セクション）
+
+    Raises:
+        ValueError: 存在しないセクションが指定された場合
+    """
+    if not value:
+        return list(SECTION_DEPENDENCIES)
+
+    names = [name.strip() for name in value.split(",") if name.strip()]
+    unknown = [name for name in names if name not in SECTION_DEPENDENCIES]
+    if unknown:
+        raise ValueError(f"不明なセクション: {', '.join(unknown)}（指定可能: {', '.join(SECTION_DEPENDENCIES)}）")
+    return names
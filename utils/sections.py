@@ -0,0 +1,150 @@
+from utils.analysis import (
+    calculate_summary_stats,
+    rank_by_er,
+    avg_by_hour,
+    avg_by_weekday,
+    simple_hashtag_summary,
+    analyze_content_patterns,
+    generate_improvement_suggestions,
+    generate_content_recommendations,
+    calculate_engagement_metrics,
+)
+from utils.accounts import ACCOUNT_COLUMN, analyze_by_account, compare_accounts, count_accounts
+from utils.posting_slots import optimize_posting_slots_by_group
+from utils.section_names import SECTION_DEPENDENCIES, TEMPLATE_SECTIONS
+
+
+def _chart_if_data(data_section, chart_name, error_bars=False, **kwargs):
+    """
+    集計結果が空でない場合のみチャートを作成するセクションを返す
+
+    error_bars=True のチャートは、プレビュー（抽出した標本での分析）の場合に誤差範囲を表示する。
+    """
+
+    def compute(analysis):
+        if analysis.get(data_section).empty:
+            return None
+        # plotlyはチャートが要求された場合にのみ読み込む
+        from utils import chart_generator
+
+        options = dict(kwargs, error_bars=True) if error_bars and analysis.sample is not None else kwargs
+        return getattr(chart_generator, chart_name)(analysis.df, **options)
+
+    return compute
+
+
+def _summary_stats(analysis):
+    """サマリー統計（プレビューの場合は平均値を層化抽出の推定値に置き換える）"""
+    stats = calculate_summary_stats(analysis.df)
+    if analysis.sample is not None and stats:
+        stats["total_posts"] = analysis.sample["estimated_rows"]
+        for name, estimate in analysis.sample["estimates"].items():
+            stats[name] = estimate["estimate"]
+    return stats
+
+
+def _ranking_records(top):
+    """ERランキングをテンプレート・JSONでそのまま使えるレコードのリストとして返す"""
+    return lambda analysis: rank_by_er(analysis.df, top=top, n=10).to_dict("records")
+
+
+def _account_comparison(analysis):
+    """アカウント別の集計から比較一覧を作成（アカウント列がない場合は空）"""
+    partitioned = analysis.get("accounts")
+    if "error" in partitioned:
+        return []
+    comparison = compare_accounts(partitioned)
+    # 全アカウントの投稿枠を1回のFFTでまとめて平滑化する
+    best_slots = optimize_posting_slots_by_group(analysis.df, ACCOUNT_COLUMN, top_n=1)
+    for item in comparison:
+        slots = best_slots.get(item["account_id"])
+        item["best_slot"] = slots[0] if slots else None
+    return comparison
+
+
+# セクション名 -> 計算関数
+SECTION_FUNCTIONS = {
+    "stats": _summary_stats,
+    "top_rankings": _ranking_records(top=True),
+    "bottom_rankings": _ranking_records(top=False),
+    "hourly": lambda a: a.aggregates.avg_by_hour() if a.aggregates else avg_by_hour(a.df),
+    "weekly": lambda a: a.aggregates.avg_by_weekday() if a.aggregates else avg_by_weekday(a.df),
+    "hashtags": lambda a: (
+        a.aggregates.hashtag_summary(top_n=10) if a.aggregates else simple_hashtag_summary(a.df, top_n=10)
+    ),
+    "hourly_chart": _chart_if_data("hourly", "create_hourly_chart", error_bars=True),
+    "weekly_chart": _chart_if_data("weekly", "create_weekly_chart", error_bars=True),
+    "hashtag_chart": _chart_if_data("hashtags", "create_hashtag_chart", top_n=10),
+    "engagement": lambda a: calculate_engagement_metrics(a.df, a.er_definitions),
+    "improvement": lambda a: generate_improvement_suggestions(a.df),
+    "content_patterns": lambda a: analyze_content_patterns(a.df),
+    "content": lambda a: generate_content_recommendations(a.df, content_analysis=a.get("content_patterns")),
+    "account_count": lambda a: count_accounts(a.df),
+    "accounts": lambda a: analyze_by_account(a.df, top_n=10),
+    "account_comparison": _account_comparison,
+}
+
+# セクション名 -> (依存するセクション, 計算関数)
+SECTIONS = {name: (dependencies, SECTION_FUNCTIONS[name]) for name, dependencies in SECTION_DEPENDENCIES.items()}
+
+
+class LazyAnalysis:
+    """
+    要求されたセクションとその依存セクションだけを必要になった時点で計算する
+
+    Args:
+        df: 前処理済みのDataFrame、またはそれを返す関数（最初に参照した時点で読み込む）
+        aggregates: 時間帯別・曜日別・ハッシュタグの集計をDataFrameなしで行うオブジェクト
+            （SQLiteの PostStore.aggregates など）。指定した場合、それらのセクションだけを
+            要求してもデータセット全体は読み込まない
+        er_definitions: エンゲージメント指標に追加するER定義（ER_CUSTOM_DEFINITIONS）
+        sample: df が層化抽出した標本の場合の抽出情報（sampling.sample_csv を参照）。
+            指定した場合、サマリー統計は推定値になり、チャートに誤差範囲を表示する
+    """
+
+    def __init__(self, df, aggregates=None, er_definitions=None, sample=None):
+        self._df = df
+        self.aggregates = aggregates
+        self.er_definitions = er_definitions
+        self.sample = sample
+        self._results = {}
+        # セクション名 -> 計算で発生したエラーのメッセージ（section() で記録する）
+        self.errors = {}
+
+    @property
+    def df(self):
+        if callable(self._df):
+            self._df = self._df()
+        return self._df
+
+    def get(self, name):
+        """セクションの結果を取得（未計算であれば依存セクションから順に計算）"""
+        if name not in self._results:
+            dependencies, compute = SECTIONS[name]
+            for dependency in dependencies:
+                self.get(dependency)
+            self._results[name] = compute(self)
+        return self._results[name]
+
+    def section(self, name):
+        """
+        テンプレート用にセクションの結果を取得する
+
+        ストリーミング中は送信済みの部分を取り消せないため、計算で例外が発生した場合は
+        errors にメッセージを記録してNoneを返す（テンプレートはそのセクションだけエラーを表示する）。
+        """
+        if name in self.errors:
+            return None
+        try:
+            return self.get(name)
+        except Exception as e:
+            self.errors[name] = str(e)
+            return None
+
+    def select(self, names):
+        """指定したセクションの結果を辞書で返す"""
+        return {name: self.get(name) for name in names}
+
+    def template_context(self):
+        """分析ページのテンプレート変数を全て計算して返す"""
+        return {key: self.get(name) for key, name in TEMPLATE_SECTIONS.items()}
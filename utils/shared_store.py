@@ -0,0 +1,281 @@
+import fcntl
+import hashlib
+import json
+import os
+import pickle
+import secrets
+import sys
+import tempfile
+import time
+from contextlib import contextmanager
+from multiprocessing import resource_tracker, shared_memory
+
+import numpy as np
+
+from utils.columnar import split_frame, assemble_frame
+
+
+def _open_segment(name, create=False, size=0):
+    """
+    共有メモリセグメントを作成・接続する
+
+    セグメントの寿命はストアの参照カウントで管理するため、プロセス終了時に
+    resource_tracker が勝手に削除しないよう追跡対象から外す。
+    """
+    if sys.version_info >= (3, 13):
+        return shared_memory.SharedMemory(name=name, create=create, size=size, track=False)
+    shm = shared_memory.SharedMemory(name=name, create=create, size=size)
+    resource_tracker.unregister(shm._name, "shared_memory")
+    return shm
+
+
+def _unlink_segment(name):
+    """共有メモリセグメントを削除（既に削除済みの場合は何もしない）"""
+    try:
+        # unlink() は追跡対象からの削除も行うため、ここでは追跡を外さずに接続する
+        shm = shared_memory.SharedMemory(name=name)
+    except FileNotFoundError:
+        return
+    shm.close()
+    shm.unlink()
+
+
+def _pid_alive(pid):
+    """プロセスが生存しているか確認"""
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        return True
+    return True
+
+
+class SharedDataset:
+    """共有メモリに接続したデータセット（DataFrameは共有メモリ上の配列を直接参照する）"""
+
+    def __init__(self, key, version, df, segments):
+        self.key = key
+        self.version = version
+        self.df = df
+        self._segments = segments
+
+    def close(self):
+        """共有メモリへの接続を閉じる（DataFrameが参照中の場合はGC時に解放される）"""
+        self.df = None
+        for shm in self._segments:
+            try:
+                shm.close()
+            except BufferError:
+                pass
+        self._segments = []
+
+
+class SharedDatasetStore:
+    """
+    パース済みデータセットを multiprocessing.shared_memory で共有するストア
+
+    数値・日時列は1つのデータセットにつき一度だけ共有メモリに書き込まれ、
+    各ワーカープロセスはコピーせずにNumPy配列として接続する。文字列などの
+    可変長の列はpickleして共有し、接続時に各プロセスへ展開する。
+
+    データセットの世代とプロセスごとの参照数はレジストリディレクトリの
+    JSONファイルにファイルロック付きで記録する。データセットが置き換えられると
+    古い世代は退役扱いとなり、最後の参照が解放された時点で削除される。
+    idle_seconds を指定すると、参照がないまま指定秒数使われていないデータセットは
+    次の公開時に退役させる。
+    """
+
+    def __init__(self, registry_dir=None, prefix="ii", idle_seconds=None):
+        self.registry_dir = registry_dir or os.path.join(tempfile.gettempdir(), "instainsight-shm")
+        self.prefix = prefix
+        self.idle_seconds = idle_seconds
+        os.makedirs(self.registry_dir, exist_ok=True)
+
+    @contextmanager
+    def _lock(self):
+        """全プロセス共通の排他ロック"""
+        with open(os.path.join(self.registry_dir, ".lock"), "a") as f:
+            fcntl.flock(f, fcntl.LOCK_EX)
+            try:
+                yield
+            finally:
+                fcntl.flock(f, fcntl.LOCK_UN)
+
+    def _registry_path(self, key):
+        return os.path.join(self.registry_dir, hashlib.sha1(key.encode("utf-8")).hexdigest() + ".json")
+
+    def _read_registry(self, key):
+        return self._read_registry_file(self._registry_path(key))
+
+    @staticmethod
+    def _read_registry_file(path):
+        try:
+            with open(path, "r", encoding="utf-8") as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            return {"current": None, "generations": {}}
+
+    def _write_registry(self, key, registry):
+        self._write_registry_file(self._registry_path(key), registry)
+
+    @staticmethod
+    def _write_registry_file(path, registry):
+        if not registry["generations"]:
+            if os.path.exists(path):
+                os.remove(path)
+            return
+        tmp_path = path + ".tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump(registry, f)
+        os.replace(tmp_path, path)
+
+    def _collect(self, registry):
+        """退役済みで参照のない世代のセグメントを削除する（終了したプロセスの参照は無視）"""
+        for version, generation in list(registry["generations"].items()):
+            refs = {pid: n for pid, n in generation["refs"].items() if _pid_alive(int(pid))}
+            generation["refs"] = refs
+            if version != registry["current"] and not refs:
+                for name in generation["segments"]:
+                    _unlink_segment(name)
+                del registry["generations"][version]
+
+    def publish(self, key, version, df):
+        """
+        データセットを共有メモリに公開する
+
+        Args:
+            key: データセットの識別子（ファイル名など）
+            version: データセットの内容を表すバージョン（内容ハッシュなど）
+            df: 公開するDataFrame
+        """
+        arrays, objects, columns = split_frame(df)
+        base = f"{self.prefix}_{hashlib.sha1(key.encode('utf-8')).hexdigest()[:10]}_{secrets.token_hex(4)}"
+
+        segments = []
+        array_meta = {}
+        try:
+            for i, (col, values) in enumerate(arrays.items()):
+                name = f"{base}_{i}"
+                shm = _open_segment(name, create=True, size=max(values.nbytes, 1))
+                np.ndarray(values.shape, dtype=values.dtype, buffer=shm.buf)[...] = values
+                shm.close()
+                segments.append(name)
+                array_meta[col] = {"segment": name, "dtype": values.dtype.str, "shape": list(values.shape)}
+
+            payload = pickle.dumps(objects, protocol=pickle.HIGHEST_PROTOCOL)
+            objects_name = f"{base}_o"
+            shm = _open_segment(objects_name, create=True, size=max(len(payload), 1))
+            shm.buf[: len(payload)] = payload
+            shm.close()
+            segments.append(objects_name)
+        except BaseException:
+            for name in segments:
+                _unlink_segment(name)
+            raise
+
+        with self._lock():
+            registry = self._read_registry(key)
+            if registry["current"] == version:
+                # 他のワーカーが同じ内容を先に公開済み
+                for name in segments:
+                    _unlink_segment(name)
+            else:
+                registry["current"] = version
+                registry["generations"][version] = {
+                    "segments": segments,
+                    "arrays": array_meta,
+                    "objects": {"segment": objects_name, "size": len(payload)},
+                    "columns": columns,
+                    "refs": {},
+                    "last_used": time.time(),
+                }
+            self._collect(registry)
+            self._write_registry(key, registry)
+            if self.idle_seconds is not None:
+                self._evict_idle(exclude=self._registry_path(key))
+
+    def _evict_idle(self, exclude=None):
+        """参照がないまま idle_seconds 以上使われていないデータセットを退役させる（ロック取得済みで呼ぶ）"""
+        now = time.time()
+        for name in os.listdir(self.registry_dir):
+            path = os.path.join(self.registry_dir, name)
+            if not name.endswith(".json") or path == exclude:
+                continue
+            registry = self._read_registry_file(path)
+            self._collect(registry)
+            generation = registry["generations"].get(registry["current"])
+            if generation is not None and not generation["refs"]:
+                if now - generation.get("last_used", 0) >= self.idle_seconds:
+                    registry["current"] = None
+                    self._collect(registry)
+            self._write_registry_file(path, registry)
+
+    def attach(self, key, version=None):
+        """
+        公開済みのデータセットに接続する
+
+        Args:
+            key: データセットの識別子
+            version: 期待するバージョン（異なる場合は接続しない）
+
+        Returns:
+            SharedDataset or None: 未公開・バージョン不一致の場合はNone
+        """
+        pid = str(os.getpid())
+        with self._lock():
+            registry = self._read_registry(key)
+            current = registry["current"]
+            if current is None or (version is not None and current != version):
+                return None
+            generation = registry["generations"][current]
+            generation["refs"][pid] = generation["refs"].get(pid, 0) + 1
+            generation["last_used"] = time.time()
+            self._write_registry(key, registry)
+
+        handles = []
+        try:
+            arrays = {}
+            for col, meta in generation["arrays"].items():
+                shm = _open_segment(meta["segment"])
+                handles.append(shm)
+                values = np.ndarray(tuple(meta["shape"]), dtype=np.dtype(meta["dtype"]), buffer=shm.buf)
+                values.flags.writeable = False
+                arrays[col] = values
+
+            shm = _open_segment(generation["objects"]["segment"])
+            handles.append(shm)
+            objects = pickle.loads(bytes(shm.buf[: generation["objects"]["size"]]))
+        except BaseException:
+            for shm in handles:
+                shm.close()
+            self._release(key, current)
+            raise
+
+        df = assemble_frame(arrays, objects, generation["columns"])
+        return SharedDataset(key, current, df, handles)
+
+    def release(self, dataset):
+        """接続を閉じて参照数を減らす（退役済みの世代は最後の参照で削除される）"""
+        dataset.close()
+        self._release(dataset.key, dataset.version)
+
+    def _release(self, key, version):
+        pid = str(os.getpid())
+        with self._lock():
+            registry = self._read_registry(key)
+            generation = registry["generations"].get(version)
+            if generation is not None and generation["refs"].get(pid):
+                generation["refs"][pid] -= 1
+                if not generation["refs"][pid]:
+                    del generation["refs"][pid]
+            self._collect(registry)
+            self._write_registry(key, registry)
+
+    def remove(self, key):
+        """データセットを退役させる（参照中の世代は最後の参照で削除される）"""
+        with self._lock():
+            registry = self._read_registry(key)
+            registry["current"] = None
+            self._collect(registry)
+            self._write_registry(key, registry)
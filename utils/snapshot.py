@@ -0,0 +1,172 @@
+import hashlib
+import json
+import math
+import os
+import tempfile
+from datetime import date, datetime
+
+# スナップショットにはフラッシュメッセージを含めず、この位置に配信時に差し込む
+FLASH_PLACEHOLDER = "<!-- flash-messages -->"
+
+# ハッシュ計算結果のキャッシュ（パス -> (mtime_ns, size, hash)）
+_hash_cache = {}
+
+
+def dataset_hash(file_path, chunk_size=1024 * 1024):
+    """
+    データセットファイルの内容ハッシュ（SHA-256）を計算する
+
+    ファイルの更新時刻とサイズが変わらない限り、計算結果を再利用する。
+
+    Args:
+        file_path: データセットファイルのパス
+        chunk_size: 読み込み単位（バイト）
+
+    Returns:
+        str: 16進数のハッシュ文字列
+    """
+    st = os.stat(file_path)
+    cached = _hash_cache.get(file_path)
+    if cached and cached[0] == st.st_mtime_ns and cached[1] == st.st_size:
+        return cached[2]
+
+    digest = hashlib.sha256()
+    with open(file_path, "rb") as f:
+        for chunk in iter(lambda: f.read(chunk_size), b""):
+            digest.update(chunk)
+
+    key = digest.hexdigest()
+    _hash_cache[file_path] = (st.st_mtime_ns, st.st_size, key)
+    return key
+
+
+def template_version(template_paths):
+    """テンプレートファイル群の内容からバージョン文字列を作成"""
+    digest = hashlib.sha256()
+    for path in template_paths:
+        with open(path, "rb") as f:
+            digest.update(f.read())
+    return digest.hexdigest()[:16]
+
+
+def settings_version(version, settings):
+    """
+    分析結果に影響する設定をバージョン文字列に含める
+
+    Args:
+        version: template_version で作成したバージョン
+        settings: JSONに変換可能な設定値（空の場合は version をそのまま返す）
+    """
+    if not settings:
+        return version
+    encoded = json.dumps(settings, sort_keys=True, ensure_ascii=False).encode("utf-8")
+    return f"{version}-{hashlib.sha256(encoded).hexdigest()[:8]}"
+
+
+def to_jsonable(obj):
+    """分析結果をJSONに変換可能な形式に変換"""
+    # スナップショット配信時にpandasを読み込まないよう、変換時にのみインポートする
+    import numpy as np
+    import pandas as pd
+
+    if isinstance(obj, pd.DataFrame):
+        return [to_jsonable(record) for record in obj.to_dict("records")]
+    if isinstance(obj, pd.Series):
+        return to_jsonable(obj.to_dict())
+    if isinstance(obj, dict):
+        return {str(key): to_jsonable(value) for key, value in obj.items()}
+    if isinstance(obj, (list, tuple)):
+        return [to_jsonable(value) for value in obj]
+    if isinstance(obj, (pd.Timestamp, datetime, date)):
+        return None if pd.isna(obj) else obj.isoformat()
+    if isinstance(obj, np.generic):
+        obj = obj.item()
+    if isinstance(obj, float) and math.isnan(obj):
+        return None
+    if obj is pd.NaT:
+        return None
+    return obj
+
+
+def snapshot_paths(snapshot_folder, key):
+    """スナップショットのHTML・JSONファイルのパスを返す"""
+    return (
+        os.path.join(snapshot_folder, f"{key}.html"),
+        os.path.join(snapshot_folder, f"{key}.json"),
+    )
+
+
+def load_snapshot_meta(snapshot_folder, key, version):
+    """
+    保存済みのスナップショットのメタ情報を読み込む
+
+    テンプレートのバージョンが一致しない場合は古いスナップショットとみなす。
+
+    Returns:
+        dict or None: メタ情報（存在しない場合はNone）
+    """
+    html_path, json_path = snapshot_paths(snapshot_folder, key)
+    try:
+        with open(json_path, "r", encoding="utf-8") as f:
+            meta = json.load(f).get("meta", {})
+    except (OSError, ValueError):
+        return None
+    if meta.get("template_version") != version or "etag" not in meta or not os.path.exists(html_path):
+        return None
+    return meta
+
+
+def load_snapshot_results(snapshot_folder, key):
+    """保存済みの分析結果JSONを読み込む（存在しない場合はNone）"""
+    _, json_path = snapshot_paths(snapshot_folder, key)
+    try:
+        with open(json_path, "r", encoding="utf-8") as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return None
+
+
+def _atomic_write(path, text):
+    """一時ファイル経由でファイルを書き込み、途中状態を読まれないようにする"""
+    directory = os.path.dirname(path)
+    fd, tmp_path = tempfile.mkstemp(dir=directory, prefix=".tmp-")
+    try:
+        with os.fdopen(fd, "w", encoding="utf-8") as f:
+            f.write(text)
+        os.replace(tmp_path, path)
+    except BaseException:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+        raise
+
+
+def save_snapshot(snapshot_folder, key, html, results, version, filename):
+    """
+    レンダリング済みHTMLと分析結果JSONをスナップショットとして保存する
+
+    Args:
+        snapshot_folder: 保存先ディレクトリ
+        key: データセットのハッシュ
+        html: レンダリング済みの分析ページ
+        results: テンプレートに渡した分析結果
+        version: テンプレートのバージョン
+        filename: 元のファイル名
+    """
+    os.makedirs(snapshot_folder, exist_ok=True)
+    html_path, json_path = snapshot_paths(snapshot_folder, key)
+
+    payload = {
+        "meta": {
+            "dataset_hash": key,
+            "filename": filename,
+            "template_version": version,
+            # 条件付きGET用のETag（レンダリング済みHTMLの内容ハッシュ）
+            "etag": hashlib.sha256(html.encode("utf-8")).hexdigest()[:32],
+            "created_at": datetime.now().isoformat(timespec="seconds"),
+        },
+        "results": to_jsonable(results),
+    }
+
+    # HTMLを先に書き込み、JSON（メタ情報）の存在をスナップショット完成の目印にする
+    _atomic_write(html_path, html)
+    _atomic_write(json_path, json.dumps(payload, ensure_ascii=False))
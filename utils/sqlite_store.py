@@ -0,0 +1,211 @@
+import os
+import sqlite3
+from contextlib import closing
+from datetime import datetime
+
+import pandas as pd
+
+from utils.analysis import format_hourly, format_weekday
+
+SQLITE_NAME = ".posts.sqlite3"
+
+# 保存する列と型（前処理後のDataFrameに存在する列だけを保存する）
+POST_COLUMNS = {
+    "post_id": "TEXT",
+    "posted_at": "TEXT",
+    "hour": "INTEGER",
+    "weekday": "TEXT",
+    "followers_at_post": "REAL",
+    "reach": "REAL",
+    "impressions": "REAL",
+    "likes": "REAL",
+    "comments": "REAL",
+    "saves": "REAL",
+    "engagement_total": "REAL",
+    "er_percentage": "REAL",
+    "hashtags": "TEXT",
+    "account_id": "TEXT",
+}
+
+SCHEMA = f"""
+CREATE TABLE IF NOT EXISTS datasets (
+    dataset TEXT PRIMARY KEY,
+    row_count INTEGER NOT NULL,
+    columns TEXT NOT NULL,
+    created_at TEXT NOT NULL
+);
+CREATE TABLE IF NOT EXISTS posts (
+    dataset TEXT NOT NULL,
+    row INTEGER NOT NULL,
+    {", ".join(f"{name} {sql_type}" for name, sql_type in POST_COLUMNS.items())},
+    PRIMARY KEY (dataset, row)
+) WITHOUT ROWID;
+CREATE INDEX IF NOT EXISTS posts_posted_at ON posts (dataset, posted_at);
+CREATE INDEX IF NOT EXISTS posts_hour ON posts (dataset, hour, er_percentage);
+CREATE INDEX IF NOT EXISTS posts_weekday ON posts (dataset, weekday, er_percentage);
+CREATE TABLE IF NOT EXISTS post_hashtags (
+    dataset TEXT NOT NULL,
+    seq INTEGER NOT NULL,
+    row INTEGER NOT NULL,
+    hashtag TEXT NOT NULL,
+    PRIMARY KEY (dataset, seq)
+) WITHOUT ROWID;
+CREATE INDEX IF NOT EXISTS post_hashtags_tag ON post_hashtags (dataset, hashtag, seq);
+"""
+
+
+def _column_values(series):
+    """DataFrameの列をSQLiteに渡せる値（欠損値はNone）のリストに変換"""
+    if pd.api.types.is_datetime64_any_dtype(series):
+        values = series.dt.strftime("%Y-%m-%d %H:%M:%S")
+    else:
+        values = series
+    values = values.astype(object)
+    return values.where(series.notna(), None).tolist()
+
+
+def _normalized_hashtags(hashtags):
+    """
+    投稿ごとのハッシュタグを正規化して (行番号, ハッシュタグ) の組に展開する
+
+    simple_hashtag_summary と同じく、カンマで分割・前後の空白を除去・小文字化する。
+    """
+    tags = hashtags.where(hashtags.map(lambda value: isinstance(value, str))).dropna()
+    tags = tags.str.split(",").explode().str.strip().str.lower()
+    tags = tags[tags.fillna("") != ""]
+    return list(zip(tags.index.tolist(), tags.tolist()))
+
+
+class PostStore:
+    """
+    前処理済みの投稿をSQLiteに保存し、集計をSQLで実行する
+
+    データセットは内容ハッシュをキーに posts テーブル（投稿日時・時間帯・曜日に
+    インデックス）と正規化した post_hashtags テーブルに保存する。時間帯別・曜日別・
+    ハッシュタグの集計はSQLで行い、集計済みの行だけをPythonに読み込む。
+    """
+
+    def __init__(self, db_path):
+        self.db_path = db_path
+        directory = os.path.dirname(db_path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        with closing(self._connect()) as conn:
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.executescript(SCHEMA)
+
+    def _connect(self):
+        conn = sqlite3.connect(self.db_path, timeout=30)
+        conn.execute("PRAGMA synchronous=NORMAL")
+        return conn
+
+    def has_dataset(self, key):
+        """データセットが保存済みか"""
+        with closing(self._connect()) as conn:
+            return conn.execute("SELECT 1 FROM datasets WHERE dataset = ?", (key,)).fetchone() is not None
+
+    def save(self, key, df):
+        """
+        データセットを保存する（保存済みの場合は置き換える）
+
+        Args:
+            key: データセットの内容ハッシュ
+            df: 前処理済みのDataFrame
+        """
+        columns = [col for col in POST_COLUMNS if col in df.columns]
+        values = [_column_values(df[col]) for col in columns]
+        rows = [(key, row, *record) for row, record in enumerate(zip(*values))] if columns else []
+        hashtags = []
+        if "hashtags" in df.columns:
+            positions = {label: row for row, label in enumerate(df.index)}
+            hashtags = [
+                (key, seq, positions[label], tag)
+                for seq, (label, tag) in enumerate(_normalized_hashtags(df["hashtags"]))
+            ]
+
+        with closing(self._connect()) as conn, conn:
+            self._delete(conn, key)
+            conn.executemany(
+                f"INSERT INTO posts (dataset, row, {', '.join(columns)}) "
+                f"VALUES (?, ?, {', '.join('?' for _ in columns)})",
+                rows,
+            )
+            conn.executemany("INSERT INTO post_hashtags (dataset, seq, row, hashtag) VALUES (?, ?, ?, ?)", hashtags)
+            # datasets の行は最後に書き込み、保存完了の目印にする
+            conn.execute(
+                "INSERT INTO datasets (dataset, row_count, columns, created_at) VALUES (?, ?, ?, ?)",
+                (key, len(df), ",".join(columns), datetime.now().isoformat(timespec="seconds")),
+            )
+
+    def remove(self, key):
+        """データセットを削除する"""
+        with closing(self._connect()) as conn, conn:
+            self._delete(conn, key)
+
+    @staticmethod
+    def _delete(conn, key):
+        conn.execute("DELETE FROM datasets WHERE dataset = ?", (key,))
+        conn.execute("DELETE FROM posts WHERE dataset = ?", (key,))
+        conn.execute("DELETE FROM post_hashtags WHERE dataset = ?", (key,))
+
+    def _columns(self, conn, key):
+        row = conn.execute("SELECT columns FROM datasets WHERE dataset = ?", (key,)).fetchone()
+        return set(row[0].split(",")) if row and row[0] else set()
+
+    def _group_er(self, key, column):
+        """指定した列ごとの平均ER・件数をSQLで集計（analysis の groupby と同じく欠損キーは除外）"""
+        with closing(self._connect()) as conn:
+            if not {column, "er_percentage"} <= self._columns(conn, key):
+                return None
+            rows = conn.execute(
+                f"SELECT {column}, AVG(er_percentage), COUNT(er_percentage) FROM posts "
+                f"WHERE dataset = ? AND {column} IS NOT NULL GROUP BY {column} ORDER BY {column}",
+                (key,),
+            ).fetchall()
+        if not rows:
+            return None
+        return pd.DataFrame(rows, columns=[column, "mean", "count"]).set_index(column)
+
+    def avg_by_hour(self, key):
+        """時間帯別の平均ER（analysis.avg_by_hour と同じ形式）"""
+        grouped = self._group_er(key, "hour")
+        return pd.DataFrame() if grouped is None else format_hourly(grouped)
+
+    def avg_by_weekday(self, key):
+        """曜日別の平均ER（analysis.avg_by_weekday と同じ形式）"""
+        grouped = self._group_er(key, "weekday")
+        return pd.DataFrame() if grouped is None else format_weekday(grouped)
+
+    def hashtag_summary(self, key, top_n=10):
+        """ハッシュタグの使用回数（analysis.simple_hashtag_summary と同じ形式）"""
+        with closing(self._connect()) as conn:
+            # 使用回数が同じ場合は最初に出現した順（pandasの value_counts は同数の順序が不定）
+            rows = conn.execute(
+                "SELECT hashtag, COUNT(*) AS uses FROM post_hashtags WHERE dataset = ? "
+                "GROUP BY hashtag ORDER BY uses DESC, MIN(seq) LIMIT ?",
+                (key, top_n),
+            ).fetchall()
+        if not rows:
+            return pd.DataFrame()
+        return pd.DataFrame(rows, columns=["ハッシュタグ", "使用回数"])
+
+    def aggregates(self, key):
+        """データセットを指定した集計関数の組（LazyAnalysis に渡す）"""
+        return SqlAggregates(self, key)
+
+
+class SqlAggregates:
+    """1つのデータセットに対するSQL集計"""
+
+    def __init__(self, store, key):
+        self.store = store
+        self.key = key
+
+    def avg_by_hour(self):
+        return self.store.avg_by_hour(self.key)
+
+    def avg_by_weekday(self):
+        return self.store.avg_by_weekday(self.key)
+
+    def hashtag_summary(self, top_n=10):
+        return self.store.hashtag_summary(self.key, top_n=top_n)
@@ -0,0 +1,222 @@
+import codecs
+import csv
+import hashlib
+import io
+import os
+import tempfile
+import warnings
+import zlib
+
+import pandas as pd
+from werkzeug.sansio.multipart import Data, Epilogue, File, MultipartDecoder, NeedData
+
+from utils.data_loader import preprocess
+
+# アップロードに必須の列（"id" は "post_id" の別名として扱う）
+REQUIRED_UPLOAD_COLUMNS = ["post_id", "posted_at", "likes", "comments", "saves", "followers_at_post"]
+COLUMN_ALIASES = {"id": "post_id"}
+
+READ_CHUNK_SIZE = 64 * 1024
+# この量の行が溜まるごとにpandasでパースする
+PARSE_BATCH_BYTES = 1024 * 1024
+
+
+class UploadError(Exception):
+    """アップロードされたファイルを受け付けられない場合の例外"""
+
+
+def validate_header(header):
+    """
+    ヘッダー行に必須の列が含まれているか確認
+
+    Raises:
+        UploadError: 必須の列が不足している場合
+    """
+    columns = {COLUMN_ALIASES.get(col.strip(), col.strip()) for col in header}
+    missing = [col for col in REQUIRED_UPLOAD_COLUMNS if col not in columns]
+    if missing:
+        raise UploadError(f"必須の列がありません: {', '.join(missing)}")
+
+
+class CsvStreamParser:
+    """
+    受信したCSVのバイト列を逐次パースする
+
+    最初の行でヘッダーを検証し、以降は完結した行をまとめてpandasでパースする。
+    引用符で囲まれた改行を含む行にも対応するため、引用符の数が偶数になった
+    時点を行の区切りとみなす。
+    """
+
+    def __init__(self, max_bytes=None):
+        self.max_bytes = max_bytes
+        self.total_bytes = 0
+        self.header = None
+        self.frames = []
+        self._decoder = codecs.getincrementaldecoder("utf-8-sig")()
+        self._pending = ""
+        self._record = []
+        self._record_quotes = 0
+        self._batch = []
+        self._batch_size = 0
+
+    def feed(self, data, final=False):
+        """CSVのバイト列を追加する"""
+        self.total_bytes += len(data)
+        if self.max_bytes is not None and self.total_bytes > self.max_bytes:
+            raise UploadError(f"ファイルサイズが上限（{self.max_bytes // (1024 * 1024)}MB）を超えています")
+
+        text = self._pending + self._decoder.decode(data, final=final)
+        lines = text.split("\n")
+        self._pending = "" if final else lines.pop()
+        for line in lines:
+            self._add_line(line + "\n")
+
+        if final:
+            if self._record:
+                raise UploadError("引用符が閉じられていない行があります")
+            self._parse_batch()
+
+    def _add_line(self, line):
+        self._record.append(line)
+        self._record_quotes += line.count('"')
+        if self._record_quotes % 2:
+            return
+
+        record = "".join(self._record)
+        self._record = []
+        self._record_quotes = 0
+        if not record.strip():
+            return
+
+        if self.header is None:
+            self.header = next(csv.reader([record]))
+            validate_header(self.header)
+            return
+
+        self._batch.append(record)
+        self._batch_size += len(record)
+        if self._batch_size >= PARSE_BATCH_BYTES:
+            self._parse_batch()
+
+    def _parse_batch(self):
+        """溜まった行をpandasでパースする（型はまとめて前処理で変換する）"""
+        if not self._batch:
+            return
+        try:
+            with warnings.catch_warnings():
+                # 列数がヘッダーより多い行はデータ欠損になるためエラーにする
+                warnings.simplefilter("error", pd.errors.ParserWarning)
+                frame = pd.read_csv(
+                    io.StringIO("".join(self._batch)),
+                    header=None,
+                    names=self.header,
+                    index_col=False,
+                    dtype=str,
+                )
+        except (pd.errors.ParserError, pd.errors.ParserWarning, ValueError) as e:
+            raise UploadError(f"CSVの形式が正しくありません: {str(e)}")
+        self.frames.append(frame)
+        self._batch = []
+        self._batch_size = 0
+
+    def result(self):
+        """パース結果を前処理済みのDataFrameとして返す"""
+        if self.header is None:
+            raise UploadError("ファイルが空です")
+        if self.frames:
+            raw = pd.concat(self.frames, ignore_index=True)
+        else:
+            raw = pd.DataFrame(columns=self.header, dtype=str)
+        return preprocess(raw)
+
+
+def receive_upload(stream, boundary, upload_folder, allowed, max_csv_bytes=None, field_name="file"):
+    """
+    multipartのリクエストボディを受信しながらCSVを検証・保存・パースする
+
+    ファイル名とヘッダー行は最初のチャンクで検証するため、不正なファイルは
+    ボディ全体を受信する前に拒否できる。".csv.gz" の場合は受信しながら展開する。
+    展開後のCSVの内容ハッシュも受信しながら計算する。
+    前処理は行わず、呼び出し元が内容ハッシュで新しいデータと判定した場合だけ
+    parser.result() で前処理済みのDataFrameを取得する。
+
+    Args:
+        stream: リクエストボディのストリーム
+        boundary: multipartの境界文字列
+        upload_folder: 保存先ディレクトリ
+        allowed: ファイル名が受け付け可能か判定する関数
+        max_csv_bytes: 展開後のCSVサイズの上限
+        field_name: ファイルのフォーム項目名
+
+    Returns:
+        tuple: (元のファイル名, 保存した一時ファイルのパス, CSVの内容ハッシュ, CsvStreamParser)
+
+    Raises:
+        UploadError: ファイルが不正な場合
+    """
+    decoder = MultipartDecoder(boundary.encode("latin-1"))
+    parser = None
+    inflater = None
+    filename = None
+    out = None
+    tmp_path = None
+    digest = hashlib.sha256()
+
+    try:
+        finished = False
+        while not finished:
+            chunk = stream.read(READ_CHUNK_SIZE)
+            decoder.receive_data(chunk or None)
+
+            event = decoder.next_event()
+            while not isinstance(event, NeedData):
+                if isinstance(event, Epilogue):
+                    finished = True
+                    break
+
+                if isinstance(event, File) and event.name == field_name and parser is None:
+                    filename = event.filename
+                    if not filename:
+                        raise UploadError("ファイルが選択されていません")
+                    if not allowed(filename):
+                        raise UploadError("CSVファイルを選択してください")
+
+                    parser = CsvStreamParser(max_bytes=max_csv_bytes)
+                    if filename.lower().endswith(".gz"):
+                        inflater = zlib.decompressobj(16 + zlib.MAX_WBITS)
+                    fd, tmp_path = tempfile.mkstemp(dir=upload_folder, prefix=".upload-", suffix=".csv")
+                    out = os.fdopen(fd, "wb")
+
+                elif isinstance(event, Data) and out is not None and not out.closed:
+                    data = event.data
+                    if inflater is not None:
+                        try:
+                            data = inflater.decompress(data)
+                            if not event.more_data:
+                                data += inflater.flush()
+                        except zlib.error:
+                            raise UploadError("gzipファイルを展開できません")
+                    out.write(data)
+                    digest.update(data)
+                    parser.feed(data, final=not event.more_data)
+                    if not event.more_data:
+                        out.close()
+
+                event = decoder.next_event()
+
+            if not chunk and not finished:
+                raise UploadError("アップロードが途中で終了しました")
+
+        if parser is None:
+            raise UploadError("ファイルが選択されていません")
+        if parser.header is None:
+            raise UploadError("ファイルが空です")
+
+        return filename, tmp_path, digest.hexdigest(), parser
+
+    except BaseException:
+        if out is not None:
+            out.close()
+        if tmp_path is not None and os.path.exists(tmp_path):
+            os.remove(tmp_path)
+        raise